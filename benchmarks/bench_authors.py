@@ -0,0 +1,80 @@
+"""
+Micro-benchmark of the de-duplication of the authors of the commits
+returned by the GitHub REST API, on synthetic payloads.
+
+    python benchmarks/bench_authors.py [--pages 200] [--commits 100] [--authors 50]
+"""
+import argparse
+import random
+from timeit import default_timer as timer
+
+from mkdocs_git_committers_plugin_2.authors import AuthorSet
+
+
+def make_payloads(pages: int, commits: int, authors: int):
+    users = [{"login": "user%d" % i, "html_url": "https://github.com/user%d" % i, "avatar_url": None}
+             for i in range(authors)]
+    rng = random.Random(0)
+    return [[{"author": rng.choice(users), "committer": rng.choice(users), "commit": {"message": "m"}}
+             for _ in range(commits)] for _ in range(pages)]
+
+
+def list_scan(payload, exclude_committers):
+    # Previous implementation: a new list of logins for every check, and a nested removal scan
+    authors = []
+    for commit in payload:
+        if commit['author'] and commit['author']['login'] and commit['author']['login'] not in [author['login'] for author in authors]:
+            authors.append({'login': commit['author']['login'],
+                            'name': commit['author']['login'],
+                            'url': commit['author']['html_url'],
+                            'avatar': commit['author']['avatar_url'] if commit['author']['avatar_url'] is not None else ''
+                            })
+        if commit['committer'] and commit['committer']['login'] and commit['committer']['login'] not in [author['login'] for author in authors]:
+            authors.append({'login': commit['committer']['login'],
+                            'name': commit['committer']['login'],
+                            'url': commit['committer']['html_url'],
+                            'avatar': commit['committer']['avatar_url'] if commit['committer']['avatar_url'] is not None else ''
+                            })
+    for exclude_committer in set(exclude_committers):
+        for author in tuple(authors):
+            if author["login"] == exclude_committer:
+                authors.remove(author)
+                break
+    return authors
+
+
+def author_set(payload, exclude_committers):
+    authors = AuthorSet()
+    for commit in payload:
+        for user in (commit['author'], commit['committer']):
+            if user and user['login']:
+                authors.add(user['login'], user['login'], user['html_url'], user['avatar_url'])
+    return [author for author in authors.to_list() if author["login"] not in exclude_committers]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--commits", type=int, default=100)
+    parser.add_argument("--authors", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    payloads = make_payloads(args.pages, args.commits, args.authors)
+    exclude_committers = ["user%d" % i for i in range(0, args.authors, 10)]
+    results = dict()
+    for name, aggregate in (("list scan", list_scan), ("AuthorSet", author_set)):
+        excluded = set(exclude_committers) if aggregate is author_set else exclude_committers
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = timer()
+            authors = [aggregate(payload, excluded) for payload in payloads]
+            best = min(best, timer() - start)
+        results[name] = (best, authors)
+        print(f"{name:10} {best * 1000:8.1f} ms for {args.pages} pages x {args.commits} commits")
+    assert results["list scan"][1] == results["AuthorSet"][1]
+    print(f"speedup    {results['list scan'][0] / results['AuthorSet'][0]:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
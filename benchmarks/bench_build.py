@@ -0,0 +1,136 @@
+"""
+Benchmark of mkdocs builds with the git-committers plugin, without network
+access: a synthetic git repository is generated, and the plugin queries a
+local fake of the GitHub or GitLab API. Three builds are timed, through the
+real plugin hooks:
+    cold         without any cache
+    warm         with the cache of the cold build, and no new commit
+    incremental  after new commits changed some of the pages
+
+    python benchmarks/bench_build.py --pages 200 --commits 2000 --latency 0.05
+    python benchmarks/bench_build.py --api gitlab
+    python benchmarks/bench_build.py -o graphql_batch_size=25 -o incremental_fetch=true
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import tempfile
+from timeit import default_timer as timer
+from unittest import mock
+
+import yaml
+from mkdocs.commands.build import build
+from mkdocs.config import load_config
+
+from mkdocs_git_committers_plugin_2.plugin import GitCommittersPlugin
+
+from fake_api import FakeApi
+from make_repo import add_commits, generate_repo
+
+REPOSITORY = "bench/site"
+GITLAB_PROJECT = 1
+
+
+def write_mkdocs_yml(path: str, api: str, options: dict) -> None:
+    plugin = {"cache_dir": os.path.join(path, ".cache"), "token": "bench"}
+    if api == "gitlab":
+        plugin.update(gitlab_repository=GITLAB_PROJECT, gitlab_hostname="gitlab.bench")
+    else:
+        plugin.update(repository=REPOSITORY)
+    plugin.update(options)
+    config = {"site_name": "bench", "site_dir": os.path.join(path, "site"), "plugins": [{"git-committers": plugin}]}
+    with open(os.path.join(path, "mkdocs.yml"), "w") as f:
+        yaml.safe_dump(config, f)
+
+
+def run_build(path: str, api: FakeApi) -> dict:
+    """
+    Build the site, with the plugin sending its API requests to the fake API.
+    Returns:
+        (dict): build time, plugin timings and API requests served
+    """
+    on_config = GitCommittersPlugin.on_config
+
+    def redirect(plugin, config):
+        config = on_config(plugin, config)
+        plugin.githuburl = plugin.gitlaburl = api.url
+        return config
+
+    api.reset_counts()
+    # Plugin hooks are bound when the configuration is loaded
+    with mock.patch.object(GitCommittersPlugin, "on_config", redirect):
+        config = load_config(os.path.join(path, "mkdocs.yml"))
+        plugin = config.plugins["git-committers"]
+        start = timer()
+        build(config)
+        seconds = timer() - start
+    return {"seconds": seconds, "timings": plugin.timings.report(), "requests": api.reset_counts()}
+
+
+def parse_option(option: str) -> tuple:
+    key, _, value = option.partition("=")
+    return key, yaml.safe_load(value)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--commits", type=int, default=2000, help="commits of the main repository")
+    parser.add_argument("--authors", type=int, default=50)
+    parser.add_argument("--submodules", type=int, default=0)
+    parser.add_argument("--changed", type=int, default=10, help="new commits before the incremental build")
+    parser.add_argument("--api", choices=("github", "gitlab"), default="github")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every API response")
+    parser.add_argument("--rate-limit", type=int, default=0, help="API requests allowed per window, 0 for no limit")
+    parser.add_argument("--rate-window", type=float, default=3600, help="rate limit window, in seconds")
+    parser.add_argument("-o", "--option", action="append", default=[], help="plugin option, as key=value (YAML)")
+    parser.add_argument("--keep", action="store_true", help="keep the generated repository")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show the mkdocs and plugin logs")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR, format="%(levelname)-7s -  %(message)s")
+    workdir = tempfile.mkdtemp(prefix="git-committers-bench-")
+    path = os.path.join(workdir, "site")
+    cwd = os.getcwd()
+    results = dict()
+    try:
+        start = timer()
+        submodules = generate_repo(path, args.pages, args.commits, args.authors, args.submodules)
+        write_mkdocs_yml(path, args.api, dict(parse_option(option) for option in args.option))
+        results["generate"] = {"seconds": timer() - start}
+        with FakeApi(args.latency, args.rate_limit, args.rate_window) as api:
+            api.add_repository(REPOSITORY, path, GITLAB_PROJECT)
+            for i, repository in enumerate(submodules):
+                api.add_repository(repository, os.path.join(path, "docs", "sub%d" % i))
+            # The plugin finds the git repository from the current directory
+            os.chdir(path)
+            results["cold"] = run_build(path, api)
+            results["warm"] = run_build(path, api)
+            add_commits(path, args.changed, args.authors)
+            api.add_repository(REPOSITORY, path, GITLAB_PROJECT)
+            results["incremental"] = run_build(path, api)
+    finally:
+        os.chdir(cwd)
+        if args.keep:
+            print("Repository kept in " + path)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"generated {args.pages} pages, {args.commits} commits, {args.submodules} submodules in {results['generate']['seconds']:.2f}s")
+    for name in ("cold", "warm", "incremental"):
+        result = results[name]
+        phases = result["timings"]["phases"]
+        counters = result["timings"]["counters"]
+        requests = ", ".join(f"{count} {kind}" for kind, count in sorted(result["requests"].items())) or "no requests"
+        print(f"{name:12} {result['seconds']:7.2f}s build, {phases.get('prefetch', {}).get('seconds', 0):7.2f}s prefetch - "
+              f"{counters.get('cache_hits', 0)} hits, {counters.get('cache_misses', 0)} misses - {requests}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Check that the history index returns, for every path, the same last commit
+as `git rev-list -1 HEAD -- <path>`, on a generated repository with renames
+and merges, or on an existing repository.
+
+    python benchmarks/check_history.py [path of a repository]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+from git import Repo
+
+from mkdocs_git_committers_plugin_2.history import HistoryIndex
+
+from make_repo import git, init_repo
+
+
+def commit(cwd: str, message: str, **files: str) -> None:
+    for name, content in files.items():
+        os.makedirs(os.path.dirname(os.path.join(cwd, name)), exist_ok=True)
+        with open(os.path.join(cwd, name), "w") as f:
+            f.write(content)
+    git(cwd, "add", "-A")
+    git(cwd, "commit", "-q", "-m", message)
+
+
+def make_repo(path: str) -> None:
+    init_repo(path)
+    commit(path, "init", **{"docs/a.md": "a\n", "docs/b.md": "b\n", "docs/c.md": "c\n" * 20})
+    git(path, "mv", "docs/c.md", "docs/renamed.md")
+    commit(path, "rename")
+    git(path, "checkout", "-q", "-b", "topic")
+    commit(path, "topic", **{"docs/b.md": "b topic\n", "docs/a.md": "a topic\n"})
+    git(path, "checkout", "-q", "master")
+    commit(path, "master", **{"docs/b.md": "b master\n"})
+    # Conflict on docs/b.md, resolved with a content of its own: only the merge has it
+    subprocess.run(("git", "merge", "-q", "topic"), cwd=path, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    commit(path, "merge", **{"docs/b.md": "b merged\n"})
+    git(path, "checkout", "-q", "-b", "topic2", "HEAD~1")
+    commit(path, "topic2", **{"docs/d.md": "d\n"})
+    git(path, "checkout", "-q", "master")
+    # Merge taking docs/d.md as is from one side: rev-list follows that side
+    git(path, "merge", "-q", "--no-edit", "topic2")
+    git(path, "checkout", "-q", "-b", "topic3")
+    git(path, "mv", "docs/renamed.md", "docs/moved.md")
+    commit(path, "rename on topic3")
+    git(path, "checkout", "-q", "master")
+    commit(path, "master edits the old path", **{"docs/renamed.md": "c\n" * 20 + "master\n"})
+    # Merge of a rename, changing the new path: git log lists a combined status (RM) and a single path
+    subprocess.run(("git", "merge", "-q", "--no-commit", "topic3"), cwd=path, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    commit(path, "merge topic3", **{"docs/moved.md": "c\n" * 20 + "master\nmerged\n"})
+    commit(path, "after the merge", **{"docs/e.md": "e\n"})
+
+
+def check(path: str) -> int:
+    index = HistoryIndex.build(Repo(path))
+    paths = set(git(path, "log", "--format=", "--name-only", "-c", "-M").split("\n")) - {""}
+    mismatches = 0
+    for file in sorted(paths):
+        expected = git(path, "rev-list", "-1", "HEAD", "--", file).strip()
+        actual = (index.get(file) or ("",))[0]
+        if actual != expected:
+            mismatches += 1
+            print(f"{file}: index {actual[:10] or 'missing'}, rev-list {expected[:10]}")
+    print(f"{len(paths) - mismatches}/{len(paths)} paths match git rev-list")
+    return 1 if mismatches else 0
+
+
+def main() -> int:
+    if len(sys.argv) > 1:
+        return check(sys.argv[1])
+    with tempfile.TemporaryDirectory(prefix="git-committers-check-") as path:
+        make_repo(path)
+        return check(path)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
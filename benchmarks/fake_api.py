@@ -0,0 +1,295 @@
+"""
+Local fake of the GitHub REST and GraphQL APIs and of the GitLab API, serving
+the commits of local git repositories, for the benchmarks. Latency and rate
+limits can be injected, to measure how the plugin copes with them.
+
+Only what the plugin uses is served:
+    GET  /repos/<owner>/<name>/commits?path=&sha=&per_page=&page=&since=
+    POST /graphql, with history(path:, since:, after:) fields, aliased or not
+    GET  /projects/<id>/repository/commits?path=&ref_name=&per_page=&page=&since=
+    GET  /users?search=<name>
+"""
+import hashlib
+import json
+import re
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+HEADER_MARKER = "\x1e"
+FIELD_SEPARATOR = "\x1f"
+LOG_FORMAT = HEADER_MARKER + FIELD_SEPARATOR.join(("%H", "%at", "%an", "%cn", "%(trailers:key=Co-authored-by,valueonly,separator=%x1f)"))
+
+
+class Commit(NamedTuple):
+    sha: str
+    time: int
+    author: str
+    committer: str
+    coauthors: Tuple[str, ...]
+
+
+def index_repo(path: str) -> Dict[str, List[Commit]]:
+    """
+    Args:
+        path (str): path of a git repository
+    Returns:
+        (dict): commits touching each file, newest first
+    """
+    log = subprocess.run(("git", "log", "--name-only", "--format=" + LOG_FORMAT), cwd=path, check=True,
+                         stdout=subprocess.PIPE).stdout.decode()
+    commits: Dict[str, List[Commit]] = dict()
+    for chunk in log.split(HEADER_MARKER)[1:]:
+        header, _, files = chunk.partition("\n")
+        sha, timestamp, author, committer, trailers = header.split(FIELD_SEPARATOR, 4)
+        coauthors = tuple(trailer.split(" <")[0].strip() for trailer in trailers.split(FIELD_SEPARATOR) if trailer.strip())
+        commit = Commit(sha, int(timestamp), author, committer, coauthors)
+        for file in files.splitlines():
+            if file:
+                commits.setdefault(file, []).append(commit)
+    return commits
+
+
+def iso_time(timestamp: int) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def parse_time(value: Optional[str]) -> int:
+    if not value:
+        return 0
+    return int(datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc).timestamp())
+
+
+class RateLimit:
+    """
+    Fixed window rate limit per resource (core, graphql), like GitHub's.
+    """
+
+    def __init__(self, limit: int = 0, window: float = 3600):
+        self.limit = limit
+        self.window = window
+        self.lock = threading.Lock()
+        self.windows: Dict[str, Tuple[int, float]] = dict()
+
+    def take(self, resource: str) -> Tuple[bool, int, int]:
+        """
+        Returns:
+            (tuple): whether the request is allowed, remaining requests and reset epoch time
+        """
+        with self.lock:
+            now = time.time()
+            used, reset = self.windows.get(resource, (0, now + self.window))
+            if reset <= now:
+                used, reset = 0, now + self.window
+            allowed = used < self.limit
+            if allowed:
+                used += 1
+            self.windows[resource] = (used, reset)
+            return allowed, self.limit - used, int(reset)
+
+
+class FakeApi:
+    """
+    Serve the commits of git repositories on 127.0.0.1, on a random port.
+    Args:
+        latency (float): seconds added to every response
+        rate_limit (int): requests allowed per window and resource, 0 for no limit
+        rate_window (float): length of the rate limit window, in seconds
+    """
+
+    def __init__(self, latency: float = 0.0, rate_limit: int = 0, rate_window: float = 3600):
+        self.latency = latency
+        self.rate_limit = RateLimit(rate_limit, rate_window) if rate_limit else None
+        self.repositories: Dict[str, Dict[str, List[Commit]]] = dict()
+        self.gitlab_projects: Dict[str, str] = dict()
+        self.lock = threading.Lock()
+        self.counts: Dict[str, int] = dict()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        return "http://127.0.0.1:%d" % self.server.server_port
+
+    def add_repository(self, name: str, path: str, gitlab_project: int = 0) -> None:
+        """
+        Serve (or serve again, after new commits) a git repository.
+        Args:
+            name (str): GitHub repository, as owner/name
+            path (str): path of the git repository
+            gitlab_project (int): GitLab project ID to serve it as, if any
+        """
+        commits = index_repo(path)
+        with self.lock:
+            self.repositories[name] = commits
+            if gitlab_project:
+                self.gitlab_projects[str(gitlab_project)] = name
+
+    def count(self, kind: str) -> None:
+        with self.lock:
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    def reset_counts(self) -> Dict[str, int]:
+        with self.lock:
+            counts, self.counts = self.counts, dict()
+        return counts
+
+    def start(self) -> "FakeApi":
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "FakeApi":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def commits(self, repository: str, path: str, since: int = 0) -> List[Commit]:
+        with self.lock:
+            commits = self.repositories.get(repository, {}).get(path, [])
+        return [commit for commit in commits if commit.time >= since]
+
+    def handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def send(self, status: int, body=None, headers: Optional[dict] = None) -> None:
+                data = json.dumps(body).encode() if body is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def limited(self, resource: str, gitlab: bool = False) -> Optional[dict]:
+                # Returns the rate limit headers, or None once the rate limited response is sent
+                if api.latency:
+                    time.sleep(api.latency)
+                if not api.rate_limit:
+                    return {}
+                allowed, remaining, reset = api.rate_limit.take(resource)
+                prefix = "RateLimit-" if gitlab else "X-RateLimit-"
+                headers = {prefix + "Limit": str(api.rate_limit.limit), prefix + "Remaining": str(remaining), prefix + "Reset": str(reset)}
+                if allowed:
+                    return headers
+                api.count("rate_limited")
+                if gitlab:
+                    self.send(429, {"message": "Too Many Requests"}, dict(headers, **{"Retry-After": str(max(0, reset - int(time.time())))}))
+                else:
+                    self.send(403, {"message": "API rate limit exceeded"}, headers)
+                return None
+
+            def next_link(self, url, query: dict, page: int, per_page: int, total: int) -> dict:
+                if page * per_page >= total:
+                    return {}
+                query = dict(query, page=[str(page + 1)])
+                return {"Link": '<%s%s?%s>; rel="next"' % (api.url, url.path, urlencode(query, doseq=True))}
+
+            def do_GET(self) -> None:
+                url = urlsplit(self.path)
+                query = parse_qs(url.query)
+                arg = lambda key, default="": query.get(key, [default])[0]
+                match = re.match(r"^/repos/([^/]+/[^/]+)/commits$", url.path)
+                if match:
+                    return self.github_commits(url, query, match.group(1), arg)
+                match = re.match(r"^/projects/([^/]+)/repository/commits$", url.path)
+                if match:
+                    return self.gitlab_commits(url, query, match.group(1), arg)
+                if url.path == "/users":
+                    headers = self.limited("core", gitlab=True)
+                    if headers is None:
+                        return
+                    api.count("gitlab_search")
+                    name = arg("search")
+                    return self.send(200, [{"name": name, "username": name, "web_url": "https://gitlab.com/" + name, "avatar_url": None}], headers)
+                self.send(404, {"message": "Not Found"})
+
+            def github_commits(self, url, query: dict, repository: str, arg) -> None:
+                path, per_page, page = arg("path"), int(arg("per_page", "30")), int(arg("page", "1"))
+                commits = api.commits(repository, path, parse_time(arg("since")))
+                etag = '"%s"' % hashlib.sha1((url.query + (commits[0].sha if commits else "")).encode()).hexdigest()
+                # Conditional requests are not charged against the rate limit
+                if self.headers.get("If-None-Match") == etag:
+                    if api.latency:
+                        time.sleep(api.latency)
+                    api.count("rest_not_modified")
+                    return self.send(304, headers={"ETag": etag})
+                headers = self.limited("core")
+                if headers is None:
+                    return
+                api.count("rest")
+                body = []
+                for commit in commits[(page - 1) * per_page:page * per_page]:
+                    message = "Update docs" + "".join("\n\nCo-authored-by: %s <%s@users.noreply.github.com>" % (login, login)
+                                                      for login in commit.coauthors)
+                    body.append({"sha": commit.sha,
+                                 "commit": {"message": message, "author": {"date": iso_time(commit.time)}},
+                                 "author": {"login": commit.author, "html_url": "https://github.com/" + commit.author,
+                                            "avatar_url": "https://avatars.githubusercontent.com/" + commit.author},
+                                 "committer": {"login": commit.committer, "html_url": "https://github.com/" + commit.committer,
+                                               "avatar_url": "https://avatars.githubusercontent.com/" + commit.committer}})
+                headers.update(self.next_link(url, query, page, per_page, len(commits)))
+                if page == 1:
+                    headers["ETag"] = etag
+                self.send(200, body, headers)
+
+            def gitlab_commits(self, url, query: dict, project: str, arg) -> None:
+                headers = self.limited("core", gitlab=True)
+                if headers is None:
+                    return
+                api.count("gitlab")
+                path, per_page, page = arg("path"), int(arg("per_page", "20")), int(arg("page", "1"))
+                commits = api.commits(api.gitlab_projects.get(project, ""), path, parse_time(arg("since")))
+                body = [{"id": commit.sha, "author_name": commit.author, "authored_date": iso_time(commit.time)}
+                        for commit in commits[(page - 1) * per_page:page * per_page]]
+                headers.update(self.next_link(url, query, page, per_page, len(commits)))
+                self.send(200, body, headers)
+
+            def do_POST(self) -> None:
+                if urlsplit(self.path).path != "/graphql":
+                    return self.send(404, {"message": "Not Found"})
+                query = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["query"]
+                headers = self.limited("graphql")
+                if headers is None:
+                    return
+                api.count("graphql")
+                match = re.search(r'repository\(owner: "([^"]+)", name: "([^"]+)"\)', query)
+                repository = match.group(1) + "/" + match.group(2)
+                histories = dict()
+                for alias, args in re.findall(r"(?:(\w+): )?history\(([^)]*)\)", query):
+                    args = {key: json.loads(value) for key, value in re.findall(r'(\w+): ("(?:[^"\\]|\\.)*"|\d+)', args)}
+                    commits = api.commits(repository, args["path"], parse_time(args.get("since")))
+                    start = int(args.get("after", 0))
+                    end = start + int(args.get("first", 100))
+                    histories[alias or "history"] = {
+                        "pageInfo": {"hasNextPage": end < len(commits), "endCursor": str(end)},
+                        "nodes": [{"oid": commit.sha, "authoredDate": iso_time(commit.time),
+                                   "committer": {"user": self.user(commit.committer)},
+                                   "authors": {"nodes": [{"user": self.user(login)} for login in (commit.author,) + commit.coauthors]}}
+                                  for commit in commits[start:end]],
+                    }
+                self.send(200, {"data": {"repository": {"object": histories}}}, headers)
+
+            @staticmethod
+            def user(login: str) -> dict:
+                return {"login": login, "name": login.capitalize(), "url": "https://github.com/" + login,
+                        "avatarUrl": "https://avatars.githubusercontent.com/" + login}
+
+        return Handler
@@ -0,0 +1,152 @@
+"""
+Generate a synthetic git repository for the benchmarks: a docs folder of
+pages, a history of commits by a pool of authors (some with co-authors),
+and optionally git submodules holding pages too.
+
+    python benchmarks/make_repo.py /tmp/bench-site --pages 200 --commits 2000 --authors 50 --submodules 1
+"""
+import argparse
+import os
+import random
+import subprocess
+from typing import List, Optional
+
+# Synthetic history starts on 2020-01-01, one commit per hour
+START_TIME = 1577836800
+
+
+def git(cwd: str, *args: str, stdin: Optional[bytes] = None) -> str:
+    return subprocess.run(("git",) + args, cwd=cwd, input=stdin, check=True, stdout=subprocess.PIPE).stdout.decode()
+
+
+def identity(login: str) -> str:
+    return f"{login} <{login}@users.noreply.github.com>"
+
+
+def data(text: str) -> bytes:
+    encoded = text.encode()
+    return b"data %d\n%s\n" % (len(encoded), encoded)
+
+
+def fast_import_commits(pages: List[str], commits: int, authors: int, coauthor_ratio: float, rng: random.Random,
+                        first_mark: int = 1, start_time: int = START_TIME, parent: Optional[str] = None) -> bytes:
+    """
+    Build a git fast-import stream: a first commit adding all the pages, then
+    commits changing one to three random pages each.
+    Args:
+        pages (list): paths of the pages
+        commits (int): number of commits after the first one
+        authors (int): size of the pool of authors
+        coauthor_ratio (float): share of the commits with a co-author
+        rng (random.Random): random generator
+        first_mark (int): mark of the first commit of the stream
+        start_time (int): epoch time of the first commit of the stream
+        parent (str): commit to build on, if any
+    Returns:
+        (bytes): fast-import stream
+    """
+    stream = []
+    for i in range(commits + (0 if parent else 1)):
+        mark = first_mark + i
+        author = "user%d" % rng.randrange(authors)
+        # Most commits are merged by their author, some by a maintainer or through the web interface
+        committer = author if rng.random() < 0.8 else "user%d" % rng.randrange(min(authors, 3))
+        timestamp = start_time + 3600 * i
+        message = "Update docs %d" % mark
+        if rng.random() < coauthor_ratio:
+            message += "\n\nCo-authored-by: " + identity("user%d" % rng.randrange(authors))
+        changed = pages if i == 0 and not parent else rng.sample(pages, min(len(pages), rng.randint(1, 3)))
+        stream.append(b"commit refs/heads/master\nmark :%d\n" % mark)
+        stream.append(b"author %s %d +0000\n" % (identity(author).encode(), timestamp))
+        stream.append(b"committer %s %d +0000\n" % (identity(committer).encode(), timestamp))
+        stream.append(data(message))
+        if i > 0:
+            stream.append(b"from :%d\n" % (mark - 1))
+        elif parent:
+            stream.append(b"from %s\n" % parent.encode())
+        for page in changed:
+            stream.append(b"M 100644 inline %s\n" % page.encode())
+            stream.append(data("# %s\n\nRevision %d by %s.\n" % (os.path.basename(page), mark, author)))
+    return b"".join(stream)
+
+
+def init_repo(path: str) -> None:
+    os.makedirs(path, exist_ok=True)
+    git(path, "init", "-q")
+    git(path, "symbolic-ref", "HEAD", "refs/heads/master")
+    git(path, "config", "user.name", "bench")
+    git(path, "config", "user.email", "bench@example.com")
+    git(path, "config", "protocol.file.allow", "always")
+
+
+def generate_repo(path: str, pages: int = 200, commits: int = 2000, authors: int = 50, submodules: int = 0,
+                  coauthor_ratio: float = 0.05, seed: int = 0, owner: str = "bench") -> List[str]:
+    """
+    Generate a repository with `pages` pages under docs/, and `submodules`
+    submodules under docs/ with a tenth of the pages and commits each.
+    Submodule URLs point to github.com/<owner>/<name>, so that the plugin
+    queries them from the (fake) GitHub API.
+    Args:
+        path (str): directory of the repository, created if needed
+        pages (int): number of pages of the main repository
+        commits (int): number of commits of the main repository
+        authors (int): size of the pool of authors
+        submodules (int): number of submodules
+        coauthor_ratio (float): share of the commits with a co-author
+        seed (int): seed of the random generator
+        owner (str): GitHub owner of the submodules
+    Returns:
+        (list): GitHub repository names of the submodules
+    """
+    rng = random.Random(seed)
+    init_repo(path)
+    page_paths = ["docs/page%04d.md" % i for i in range(pages)]
+    git(path, "fast-import", "--quiet", stdin=fast_import_commits(page_paths, commits, authors, coauthor_ratio, rng))
+    git(path, "reset", "-q", "--hard", "master")
+
+    repositories = []
+    for i in range(submodules):
+        name = "sub%d" % i
+        sub_path = os.path.join(os.path.dirname(os.path.abspath(path)), os.path.basename(path) + "-" + name)
+        init_repo(sub_path)
+        sub_pages = ["page%04d.md" % j for j in range(max(1, pages // 10))]
+        git(sub_path, "fast-import", "--quiet", stdin=fast_import_commits(sub_pages, max(1, commits // 10), authors, coauthor_ratio, rng))
+        git(sub_path, "reset", "-q", "--hard", "master")
+        git(path, "-c", "protocol.file.allow=always", "submodule", "--quiet", "add", sub_path, "docs/" + name)
+        git(path, "config", "-f", ".gitmodules", "submodule.docs/%s.url" % name, "https://github.com/%s/%s" % (owner, name))
+        repositories.append(owner + "/" + name)
+    if submodules:
+        git(path, "add", ".gitmodules")
+        git(path, "commit", "-q", "-m", "Add submodules")
+    return repositories
+
+
+def add_commits(path: str, commits: int, authors: int = 50, coauthor_ratio: float = 0.05, seed: int = 1) -> None:
+    """
+    Add commits changing random pages of the main repository, e.g. to measure incremental builds.
+    """
+    rng = random.Random(seed)
+    head = git(path, "rev-parse", "HEAD").strip()
+    count = int(git(path, "rev-list", "--count", "HEAD"))
+    last_time = int(git(path, "log", "-1", "--format=%ct").strip())
+    page_paths = sorted("docs/" + name for name in os.listdir(os.path.join(path, "docs")) if name.endswith(".md"))
+    stream = fast_import_commits(page_paths, commits, authors, coauthor_ratio, rng, first_mark=count + 1,
+                                 start_time=last_time + 3600, parent=head)
+    git(path, "fast-import", "--quiet", stdin=stream)
+    git(path, "reset", "-q", "--hard", "master")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic git repository for the benchmarks.")
+    parser.add_argument("path", help="directory of the repository")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--commits", type=int, default=2000)
+    parser.add_argument("--authors", type=int, default=50)
+    parser.add_argument("--submodules", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate_repo(args.path, args.pages, args.commits, args.authors, args.submodules, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
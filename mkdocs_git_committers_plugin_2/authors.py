@@ -0,0 +1,62 @@
+"""
+Module to gather the unique contributors of a page while going through the
+commits returned by the GitHub and GitLab APIs, in linear time.
+"""
+from typing import Dict, List, NamedTuple, Optional, Set
+
+
+class Author(NamedTuple):
+    """
+    Contributor, in the form given to templates and saved in the cache.
+    """
+    login: str
+    name: str
+    url: str
+    avatar: str
+
+
+class AuthorSet:
+    """
+    Unique contributors by login, in the order they were first added.
+    """
+    __slots__ = ("authors", "names")
+
+    def __init__(self):
+        self.authors: Dict[str, Author] = dict()
+        # GitLab commits only give author names
+        self.names: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self.authors)
+
+    def __contains__(self, login: str) -> bool:
+        return login in self.authors
+
+    def add(self, login: str, name: str, url: str, avatar: Optional[str]) -> bool:
+        """
+        Args:
+            login (str): login of the contributor
+            name (str): name of the contributor
+            url (str): profile URL of the contributor
+            avatar (str): avatar URL of the contributor, or None
+        Returns:
+            (bool): whether the contributor was not in the set yet
+        """
+        if login in self.authors:
+            return False
+        self.authors[login] = Author(login, name, url, avatar if avatar is not None else '')
+        return True
+
+    def add_name(self, name: str) -> bool:
+        """
+        Record an author name seen in the commits, whether a contributor was found for it or not.
+        Returns:
+            (bool): whether the name was not seen yet
+        """
+        if name in self.names:
+            return False
+        self.names.add(name)
+        return True
+
+    def to_list(self) -> List[dict]:
+        return [author._asdict() for author in self.authors.values()]
@@ -0,0 +1,204 @@
+"""
+Module to store the page authors cache.
+Two backends are available: `json` keeps the whole cache in memory and
+rewrites it in one file, `sqlite` loads entries lazily and only writes the
+changed ones, in one transaction.
+"""
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+from mkdocs_git_committers_plugin_2.identities import IdentityCache
+
+LOG = logging.getLogger("mkdocs.plugins." + __name__)
+
+# The umask can only be read by setting it: read once, before mkdocs writes files from other threads
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+def write_atomic(path: str, data: str) -> None:
+    """
+    Write a file through a temporary file, so that an interrupted build
+    never leaves a truncated file behind.
+    Args:
+        path (str): path of the file
+        data (str): content of the file
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            # Same permissions as a file created with open()
+            os.chmod(tmp_path, 0o666 & ~UMASK)
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class JsonCache:
+    """
+    Page authors cache saved as `page-authors.json`, with contributors in
+    `identities.json`. Entries are read and written like a dict, by page path.
+    """
+
+    def __init__(self, cache_dir: str, identities: IdentityCache):
+        self.cache_dir = cache_dir
+        self.identities = identities
+        self.cache_date = ""
+        # None marks entries known to be missing
+        self.entries: Dict[str, Optional[dict]] = dict()
+        self.dirty: Set[str] = set()
+        self.lock = threading.Lock()
+
+    @property
+    def json_path(self) -> str:
+        return self.cache_dir + "/page-authors.json"
+
+    @property
+    def identities_path(self) -> str:
+        return self.cache_dir + "/identities.json"
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.dirty) or self.identities.changed
+
+    def load(self) -> None:
+        if os.path.exists(self.identities_path):
+            LOG.info("git-committers: found identities cache file - loading it")
+            with open(self.identities_path, "r") as f:
+                self.identities.load(json.loads(f.read()))
+        if os.path.exists(self.json_path):
+            LOG.info("git-committers: found page authors cache file - loading it")
+            with open(self.json_path, "r") as f:
+                cache = json.loads(f.read())
+            self.cache_date = cache['cache_date']
+            self.entries = self.identities.expand_pages(cache['page_authors'])
+
+    def lookup(self, path: str) -> Optional[dict]:
+        # All entries are loaded at once
+        return None
+
+    def get(self, path: str, default=None):
+        with self.lock:
+            if path not in self.entries:
+                self.entries[path] = self.lookup(path)
+            entry = self.entries[path]
+        return default if entry is None else entry
+
+    def __contains__(self, path: str) -> bool:
+        return self.get(path) is not None
+
+    def __getitem__(self, path: str) -> dict:
+        entry = self.get(path)
+        if entry is None:
+            raise KeyError(path)
+        return entry
+
+    def __setitem__(self, path: str, entry: dict) -> None:
+        with self.lock:
+            self.entries[path] = entry
+            self.dirty.add(path)
+
+    def save(self) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # The background refresh of mkdocs serve may add entries meanwhile: they are saved the next time
+        with self.lock:
+            dirty = set(self.dirty)
+            if dirty:
+                # Pages reference their authors in the identity table, which is saved along
+                entries = {path: entry for path, entry in self.entries.items() if entry is not None}
+                page_authors = self.identities.compact_pages(entries)
+            users, searches = set(self.identities.dirty_users), set(self.identities.dirty_searches)
+            identities_changed = self.identities.changed
+            identities = {key: dict(value) for key, value in self.identities.dump().items()}
+        if dirty:
+            LOG.info("git-committers: saving page authors cache file")
+            json_data = json.dumps({'cache_date': datetime.now().strftime("%Y-%m-%d"), 'page_authors': page_authors})
+            write_atomic(self.json_path, json_data)
+        if identities_changed:
+            LOG.info("git-committers: saving identities cache file")
+            write_atomic(self.identities_path, json.dumps(identities))
+        with self.lock:
+            self.dirty -= dirty
+            self.identities.dirty_users -= users
+            self.identities.dirty_searches -= searches
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteCache(JsonCache):
+    """
+    Page authors cache saved as `page-authors.sqlite3`. Pages are looked up
+    when first needed, and only the changed entries are written back.
+    The JSON cache files are imported when the database does not exist yet.
+    """
+
+    @property
+    def db_path(self) -> str:
+        return self.cache_dir + "/page-authors.sqlite3"
+
+    def load(self) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        migrate = not os.path.exists(self.db_path) and os.path.exists(self.json_path)
+        # Pages are prefetched concurrently: the connection is shared, under the lock
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self.db:
+            self.db.execute("CREATE TABLE IF NOT EXISTS pages (path TEXT PRIMARY KEY, entry TEXT NOT NULL)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS users (login TEXT PRIMARY KEY, record TEXT NOT NULL)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS searches (name TEXT PRIMARY KEY, search TEXT NOT NULL)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        if migrate:
+            LOG.info("git-committers: importing page authors cache file in " + self.db_path)
+            super().load()
+            self.dirty = set(self.entries)
+            self.identities.dirty_users = set(self.identities.users)
+            self.identities.dirty_searches = set(self.identities.searches)
+            return
+        self.identities.load({
+            "users": {login: json.loads(record) for login, record in self.db.execute("SELECT login, record FROM users")},
+            "searches": {name: json.loads(search) for name, search in self.db.execute("SELECT name, search FROM searches")},
+        })
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'cache_date'").fetchone()
+        self.cache_date = row[0] if row else ""
+
+    def lookup(self, path: str) -> Optional[dict]:
+        row = self.db.execute("SELECT entry FROM pages WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return None
+        return self.identities.expand_page(json.loads(row[0]))
+
+    def save(self) -> None:
+        if not self.changed:
+            return
+        # The background refresh of mkdocs serve may add entries meanwhile: they are saved the next time
+        with self.lock:
+            dirty = set(self.dirty)
+            LOG.info(f"git-committers: saving {len(dirty)} page authors cache entries")
+            pages = [(path, json.dumps(self.identities.compact_page(self.entries[path]))) for path in dirty]
+            users, searches = set(self.identities.dirty_users), set(self.identities.dirty_searches)
+            # One transaction: an interrupted build leaves the previous cache as it was
+            with self.db:
+                self.db.executemany("INSERT OR REPLACE INTO pages (path, entry) VALUES (?, ?)", pages)
+                self.db.executemany("INSERT OR REPLACE INTO users (login, record) VALUES (?, ?)",
+                                    [(login, json.dumps(self.identities.users[login])) for login in users])
+                self.db.executemany("INSERT OR REPLACE INTO searches (name, search) VALUES (?, ?)",
+                                    [(name, json.dumps(self.identities.searches[name])) for name in searches])
+                self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('cache_date', ?)",
+                                (datetime.now().strftime("%Y-%m-%d"),))
+            self.dirty -= dirty
+            self.identities.dirty_users -= users
+            self.identities.dirty_searches -= searches
+
+    def close(self) -> None:
+        self.db.close()
+
+
+CACHE_BACKENDS = {"json": JsonCache, "sqlite": SqliteCache}
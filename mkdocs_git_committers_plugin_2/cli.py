@@ -0,0 +1,94 @@
+"""
+Command line to warm up the page authors cache outside of a mkdocs build,
+e.g. in a nightly job with a high quota token, so that the builds of pull
+request previews only read the cache.
+An interrupted run is resumed by running it again: pages already in the
+cache for their last commit are skipped.
+"""
+import argparse
+import logging
+import sys
+from timeit import default_timer as timer
+
+from mkdocs.config import load_config
+from mkdocs.structure.files import get_files
+
+from mkdocs_git_committers_plugin_2.plugin import GitCommittersPlugin
+
+LOG = logging.getLogger("mkdocs.plugins." + __name__)
+
+
+def find_plugin(config) -> GitCommittersPlugin:
+    for plugin in config.plugins.values():
+        if isinstance(plugin, GitCommittersPlugin):
+            return plugin
+    raise SystemExit("git-committers plugin is not configured in " + config.config_file_path)
+
+
+def warm(config_file: str, since: str = "", save_every: int = 50) -> int:
+    """
+    Fetch the contributors of all the pages missing from the cache, saving
+    the cache every `save_every` pages.
+    Args:
+        config_file (str): path of mkdocs.yml
+        since (str): only warm up the pages changed since this git ref
+        save_every (int): number of pages fetched between cache saves
+    Returns:
+        (int): number of pages fetched
+    """
+    config = load_config(config_file)
+    plugin = find_plugin(config)
+    plugin.on_config(config)
+    if not plugin.enabled:
+        LOG.warning("git-committers: plugin is disabled, nothing to warm up")
+        return 0
+    plugin.on_pre_build(config=config)
+
+    git_paths = plugin.get_page_paths(get_files(config))
+    if since:
+        changed = set(plugin.localrepo.git.diff("--name-only", since, "HEAD", "--", plugin.config['docs_path']).splitlines())
+        git_paths = [git_path for git_path in git_paths if git_path.replace("\\", "/") in changed]
+        LOG.info(f"git-committers: {len(git_paths)} pages changed since {since}")
+    todo = [git_path for git_path in git_paths if plugin.needs_fetch(git_path.replace("\\", "/"))]
+    LOG.info(f"git-committers: {len(git_paths) - len(todo)} pages already cached, {len(todo)} to fetch")
+
+    start = timer()
+    done = 0
+    try:
+        for i in range(0, len(todo), max(1, save_every)):
+            chunk = todo[i:i + max(1, save_every)]
+            # Spread the rate limit budget across all the pages left, not only this chunk
+            plugin.scheduler.expect(plugin.expected_requests(len(todo) - done))
+            plugin.prefetch_contributors(chunk, expect=False)
+            plugin.cache_page_authors.save()
+            done += len(chunk)
+            LOG.info(f"git-committers: {done}/{len(todo)} pages fetched in {timer() - start:.0f}s - "
+                     f"{plugin.scheduler.stats()} - {plugin.scheduler.budget()}")
+    except KeyboardInterrupt:
+        LOG.warning("git-committers: interrupted, saving the cache. Run the command again to resume.")
+        plugin.cache_page_authors.save()
+        raise
+    plugin.on_post_build(config=config)
+    return done
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="mkdocs-git-committers", description="Warm up the git-committers page authors cache outside of a mkdocs build.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    warm_parser = subparsers.add_parser("warm", help="fetch the contributors of the pages missing from the cache")
+    warm_parser.add_argument("-f", "--config-file", default="mkdocs.yml", help="path of mkdocs.yml (default: mkdocs.yml)")
+    warm_parser.add_argument("--since", default="", help="only warm up the pages changed since this git ref")
+    warm_parser.add_argument("--save-every", type=int, default=50, help="save the cache every N pages (default: 50)")
+    warm_parser.add_argument("-q", "--quiet", action="store_true", help="only log warnings and errors")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO, format="%(levelname)-7s -  %(message)s")
+    try:
+        warm(args.config_file, since=args.since, save_every=args.save_every)
+    except KeyboardInterrupt:
+        return 130
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
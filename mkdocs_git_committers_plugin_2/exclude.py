@@ -3,8 +3,9 @@ Module to assist exclude certain files being processed by plugin.
 Inspired by https://github.com/apenwarr/mkdocs-exclude
 """
 import os
+import re
 import fnmatch
-from typing import List
+from typing import Dict, List, Optional, Pattern
 
 
 def exclude(src_path: str, globs: List[str]) -> bool:
@@ -41,3 +42,47 @@ def exclude(src_path: str, globs: List[str]) -> bool:
                 return True
 
     return False
+
+
+def compile_globs(globs: List[str]) -> Optional[Pattern]:
+    """
+    Combine globs in a single regular expression, with the same semantics as
+    fnmatch.fnmatchcase.
+    Args:
+        globs (list): list of globs
+    Returns:
+        (Pattern): regular expression matching any of the globs, or None if there are no globs
+    """
+    if not globs:
+        return None
+    return re.compile("|".join("(?:%s)" % fnmatch.translate(g) for g in globs))
+
+
+class ExcludeMatcher:
+    """
+    Same as exclude(), with the globs compiled once and the result memoized
+    per src_path, for sites with many pages and globs.
+    """
+
+    def __init__(self, globs: List[str]):
+        self.globs = list(globs)
+        self.pattern = compile_globs(self.globs)
+        self.results: Dict[str, bool] = dict()
+
+    def __call__(self, src_path: str) -> bool:
+        """
+        Args:
+            src_path (src): Path of file
+        Returns:
+            (bool): whether src_path should be excluded
+        """
+        if self.pattern is None:
+            return False
+        result = self.results.get(src_path)
+        if result is None:
+            result = self.pattern.match(src_path) is not None
+            # Windows separators, see exclude()
+            if not result and os.sep != "/":
+                result = self.pattern.match(src_path.replace(os.sep, "/")) is not None
+            self.results[src_path] = result
+        return result
@@ -0,0 +1,311 @@
+"""
+Module to index the local git history once per build.
+Instead of walking the history with one `git rev-list` per page, a single
+`git log` stream is read and the last commit touching each path is kept.
+"""
+from email.utils import parseaddr
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from git import Repo
+from git.exc import GitCommandError
+
+# Marks the start of a commit header in the `git log -z` stream
+HEADER_MARKER = "\x1e"
+# Separates the identities in a commit header
+FIELD_SEPARATOR = "\x1f"
+AUTHORS_FORMAT = FIELD_SEPARATOR.join(["%an", "%ae", "%cn", "%ce",
+                                       "%(trailers:key=Co-authored-by,valueonly,separator=%x1f)"])
+
+
+def iter_log_tokens(repo: Repo, *args: str) -> Iterator[str]:
+    """
+    Stream the NUL separated tokens of a `git log -z` call.
+    Args:
+        repo (Repo): repository to run git in
+        args (str): extra arguments for git log
+    Returns:
+        (Iterator[str]): tokens, in the order written by git
+    """
+    proc = repo.git.log(*args, as_process=True)
+    remainder = b""
+    try:
+        while True:
+            chunk = proc.stdout.read(65536)
+            if not chunk:
+                break
+            tokens = (remainder + chunk).split(b"\0")
+            remainder = tokens.pop()
+            for token in tokens:
+                yield token.decode("utf-8", "replace")
+        if remainder:
+            yield remainder.decode("utf-8", "replace")
+    finally:
+        proc.stdout.close()
+        proc.wait()
+
+
+def iter_log_commits(tokens: Iterator[str]) -> Iterator[Tuple[List[str], Dict[str, Optional[str]]]]:
+    """
+    Group the tokens of a `git log -z --raw --no-abbrev` stream by commit.
+    Args:
+        tokens (Iterator[str]): tokens of the stream
+    Returns:
+        (Iterator[tuple]): header fields, and the blob of each changed path after the commit (None once deleted)
+    """
+    fields, changes = None, dict()
+    for token in tokens:
+        token = token.lstrip("\n")
+        if not token:
+            continue
+        if token.startswith(HEADER_MARKER):
+            if fields is not None:
+                yield fields, changes
+            fields, changes = token[1:].split(FIELD_SEPARATOR), dict()
+            continue
+        # :<modes> <blobs> <status>, the blob after the commit last
+        status = token.split(" ")
+        blob = status[-2] if status[-2].strip("0") else None
+        path = next(tokens, None)
+        # Renames and copies list the old path, then the new one, unless in the combined
+        # status of a merge (e.g. RM), which only lists the path of the merge
+        if status[-1][0] in ("R", "C") and status[-1][1:].isdigit():
+            new_path = next(tokens, None)
+            # The old path of a copy is left unchanged
+            if status[-1][0] == "R" and path is not None:
+                changes[path] = None
+            path = new_path
+        if path is not None:
+            changes[path] = blob
+    if fields is not None:
+        yield fields, changes
+
+
+class PendingMerge(NamedTuple):
+    """
+    Merge which differs from its first parent for a path: it is the last
+    commit of the path, unless it has the same version of it as its second parent.
+    """
+    sha: str
+    timestamp: int
+    blob: Optional[str]
+    authors: List[Tuple[str, str]]
+    coauthors: List[Tuple[str, str]]
+
+
+class HistoryIndex:
+    """
+    Last commit (SHA and author timestamp) of every path in a repository,
+    as `git rev-list HEAD -- path` would return it first.
+    A rename is recorded against both its old and its new path.
+    With `with_authors`, the (name, email) of the authors, committers and
+    co-authors of all the commits touching each path are recorded as well.
+    """
+
+    def __init__(self, head: str = "", with_authors: bool = False):
+        self.head = head
+        self.with_authors = with_authors
+        self.entries: Dict[str, Tuple[str, int]] = dict()
+        # Dicts used as ordered sets, newest commit first
+        self.authors: Dict[str, Dict[Tuple[str, str], None]] = dict()
+        self.coauthors: Dict[str, Dict[Tuple[str, str], None]] = dict()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.entries
+
+    def get(self, path: str) -> Optional[Tuple[str, int]]:
+        """
+        Args:
+            path (str): path relative to the repository root
+        Returns:
+            (tuple): (sha, authored timestamp) of the last commit, or None
+        """
+        return self.entries.get(path.replace("\\", "/"))
+
+    def contributors(self, path: str) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+        """
+        Args:
+            path (str): path relative to the repository root
+        Returns:
+            (tuple): unique (name, email) of the authors and committers, and of the co-authors
+        """
+        path = path.replace("\\", "/")
+        return list(self.authors.get(path, ())), list(self.coauthors.get(path, ()))
+
+    def add_log(self, repo: Repo, *args: str) -> Set[str]:
+        """
+        Read a `git log` stream and record the last commit of each path.
+        At a merge, a path follows the first parent the merge has the same
+        version of it as, like `git rev-list` simplifies its history, and the
+        merge itself is its last commit if it differs from all its parents.
+        Paths already in the index are kept.
+        Args:
+            repo (Repo): repository to run git in
+            args (str): revision range and pathspec for git log
+        Returns:
+            (set): paths whose last commit is beyond the commits read, other
+            than through the first parent chain (e.g. before a range)
+        """
+        log_format = HEADER_MARKER + "%H %at %P"
+        if self.with_authors:
+            log_format += FIELD_SEPARATOR + AUTHORS_FORMAT
+        # --diff-merges=first-parent shows merges without restricting the walk to first parents
+        simplify = repo.git.version_info >= (2, 31)
+        if simplify:
+            # Full history with rewritten parents, so that every side of a merge can be followed, parents after children
+            options = ("--diff-merges=first-parent", "--full-history", "--parents", "--topo-order")
+        else:
+            # -c lists the files of a merge which differ from every parent: the last commit seen is recorded instead
+            options = ("-c",)
+        tokens = iter_log_tokens(repo, "-z", "--raw", "--no-abbrev", "-M", *options, "--format=" + log_format, *args)
+
+        pathspec = args[args.index("--"):] if "--" in args else ()
+        diffs: Dict[Tuple[str, str], Set[str]] = dict()
+
+        def octopus_changes(merge: str, parent: str) -> Set[str]:
+            if (merge, parent) not in diffs:
+                diff = repo.git.diff_tree("-r", "-z", "--name-only", "--no-renames", parent, merge, *pathspec)
+                diffs[(merge, parent)] = set(diff.split("\0")) - {""}
+            return diffs[(merge, parent)]
+
+        first_parents: Set[str] = set()
+        # Paths followed on another commit than the first parent chain, by the commit they are followed on
+        followed: Dict[str, Dict[str, Optional[PendingMerge]]] = dict()
+        detached: Set[str] = set()
+        for fields, changes in iter_log_commits(tokens):
+            commit = fields[0].split()
+            sha, timestamp, parents = commit[0], int(commit[1]), commit[2:]
+            authors, coauthors = [], []
+            if self.with_authors:
+                authors = [(fields[1], fields[2]), (fields[3], fields[4])]
+                coauthors = [parseaddr(trailer) for trailer in fields[5:] if trailer.strip()]
+                if len(parents) < 2 or not simplify:
+                    for path in changes:
+                        self.add_authors(path, authors, coauthors)
+            if not simplify:
+                for path in changes:
+                    self.entries.setdefault(path, (sha, timestamp))
+                continue
+
+            # The first commit is the tip of the first parent chain
+            on_first_parents = not first_parents or sha in first_parents
+            if on_first_parents:
+                first_parents.add(sha)
+                if parents:
+                    first_parents.add(parents[0])
+            paths = followed.pop(sha, {})
+            if on_first_parents:
+                for path, pending in list(paths.items()):
+                    if pending is None:
+                        # Back on the first parent chain
+                        detached.discard(path)
+                        del paths[path]
+                paths.update((path, None) for path in changes if path not in detached and path not in paths)
+
+            for path, pending in paths.items():
+                if path in self.entries:
+                    continue
+                if len(parents) > 1:
+                    # The changes of a merge are against its first parent
+                    if path not in changes:
+                        parent = parents[0]
+                    elif pending is not None and pending.blob != changes[path]:
+                        # The pending merge differs from this side too
+                        self.add_merge(path, pending)
+                        continue
+                    elif len(parents) == 2:
+                        # Whether the merge has the same version as its second parent is known once the path changes on that side
+                        parent, pending = parents[1], PendingMerge(sha, timestamp, changes[path], authors, coauthors)
+                    else:
+                        # Octopus merges are rare enough to compare them with their other parents one by one
+                        parent = next((parent for parent in parents[1:] if path not in octopus_changes(sha, parent)), None)
+                        if parent is None:
+                            self.add_merge(path, PendingMerge(sha, timestamp, None, authors, coauthors))
+                            continue
+                        pending = None
+                elif path in changes:
+                    if pending is not None and pending.blob != changes[path]:
+                        self.add_merge(path, pending)
+                    else:
+                        self.entries[path] = (sha, timestamp)
+                    continue
+                elif parents:
+                    parent = parents[0]
+                else:
+                    # The path did not exist before
+                    if pending is not None and pending.blob is not None:
+                        self.add_merge(path, pending)
+                    continue
+                if on_first_parents and parent == parents[0] and pending is None:
+                    continue
+                detached.add(path)
+                followed.setdefault(parent, dict()).setdefault(path, pending)
+
+        return set(path for commit, paths in followed.items() for path, pending in paths.items()
+                   if path not in self.entries and (pending is not None or commit not in first_parents))
+
+    def add_merge(self, path: str, pending: PendingMerge) -> None:
+        self.entries[path] = (pending.sha, pending.timestamp)
+        if self.with_authors:
+            self.add_authors(path, pending.authors, pending.coauthors)
+
+    def add_authors(self, path: str, authors: List[Tuple[str, str]], coauthors: List[Tuple[str, str]]) -> None:
+        self.authors.setdefault(path, dict()).update(dict.fromkeys(authors))
+        self.coauthors.setdefault(path, dict()).update(dict.fromkeys(coauthors))
+
+    def update(self, repo: Repo, head: str, path: str = "") -> Set[str]:
+        """
+        Add the commits between the indexed head and a new head, which must
+        be a descendant of it, e.g. after a commit under `mkdocs serve`.
+        Args:
+            repo (Repo): repository of the index
+            head (str): SHA of the new head
+            path (str): only index the history below this path (e.g. docs/)
+        Returns:
+            (set): paths touched by the new commits
+        Raises:
+            ValueError: if the history of some paths goes through other commits than the indexed head, e.g.
+                after merging a branch into the indexed head: the index must be built again
+        """
+        delta = HistoryIndex(head, self.with_authors)
+        pathspec = ("--", path) if path else ()
+        if delta.add_log(repo, self.head + ".." + head, *pathspec):
+            raise ValueError("history of some paths goes through a merged branch")
+        # The paths without new commits follow the first parent chain back to the indexed head
+        first_parents = repo.git.rev_list("--first-parent", "--parents", self.head + ".." + head).splitlines()
+        if first_parents and first_parents[-1].split(" ")[1:2] != [self.head]:
+            raise ValueError("indexed head is not on the first parent chain of " + head)
+        self.entries.update(delta.entries)
+        for authors, new_authors in ((self.authors, delta.authors), (self.coauthors, delta.coauthors)):
+            for changed_path, identities in new_authors.items():
+                # Newest commits first
+                identities.update(authors.get(changed_path, {}))
+                authors[changed_path] = identities
+        self.head = head
+        return set(delta.entries) | set(delta.authors)
+
+    @classmethod
+    def build(cls, repo: Repo, path: str = "", with_authors: bool = False) -> "HistoryIndex":
+        """
+        Build the index of a repository with a single `git log` call.
+        Args:
+            repo (Repo): repository to index
+            path (str): only index the history below this path (e.g. docs/)
+            with_authors (bool): also record the authors of each path
+        Returns:
+            (HistoryIndex): the index, empty if the repository has no commits
+        """
+        try:
+            head = repo.head.commit.hexsha
+        except ValueError:
+            # No commit yet
+            return cls(with_authors=with_authors)
+        index = cls(head, with_authors)
+        pathspec = ("--", path) if path else ()
+        try:
+            index.add_log(repo, head, *pathspec)
+        except GitCommandError:
+            return cls(with_authors=with_authors)
+        return index
@@ -0,0 +1,129 @@
+"""
+Module to share contributor identities across pages and builds.
+The identity table is saved next to the page authors cache file: page
+entries reference contributors by login instead of copying them, and the
+GitLab user searches are kept, including the ones which found nobody.
+"""
+import time
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+# Fields of a GitLab user kept in the cache
+GITLAB_USER_FIELDS = ("username", "web_url", "avatar_url")
+
+
+class IdentityCache:
+    """
+    Contributors by login, and GitLab user search results by author name.
+    """
+
+    def __init__(self, ttl: int = 604800):
+        self.ttl = ttl
+        self.users: Dict[str, dict] = dict()
+        self.searches: Dict[str, dict] = dict()
+        # Keys changed since loaded, for the cache backends writing only those
+        self.dirty_users: Set[str] = set()
+        self.dirty_searches: Set[str] = set()
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.dirty_users or self.dirty_searches)
+
+    def clear_changes(self) -> None:
+        self.dirty_users = set()
+        self.dirty_searches = set()
+
+    def load(self, data: dict) -> None:
+        """
+        Args:
+            data (dict): content of the identities cache file
+        """
+        self.users = data.get("users", {})
+        self.searches = data.get("searches", {})
+        self.clear_changes()
+
+    def dump(self) -> dict:
+        """
+        Returns:
+            (dict): content of the identities cache file
+        """
+        return {"users": self.users, "searches": self.searches}
+
+    def get_search(self, name: str) -> Tuple[bool, Optional[dict]]:
+        """
+        Look for the GitLab user search of an author name, unless it expired.
+        Args:
+            name (str): git author name
+        Returns:
+            (tuple): whether the search is cached, and the user found (None if nobody was found)
+        """
+        search = self.searches.get(name)
+        if search is None or time.time() - search["cached_at"] > self.ttl:
+            return False, None
+        return True, search["user"]
+
+    def set_search(self, name: str, user: Optional[dict]) -> None:
+        """
+        Args:
+            name (str): git author name
+            user (dict): GitLab user found, or None if nobody was found
+        """
+        if user is not None:
+            user = {field: user.get(field) for field in GITLAB_USER_FIELDS}
+        self.searches[name] = {"user": user, "cached_at": int(time.time())}
+        self.dirty_searches.add(name)
+
+    def compact_pages(self, page_authors: Dict[str, dict]) -> Dict[str, dict]:
+        """
+        Replace the authors of every page by references to the identity table,
+        which is rebuilt from the authors of the pages.
+        Args:
+            page_authors (dict): cache entries by page path
+        Returns:
+            (dict): cache entries by page path, with compact authors
+        """
+        self.users = dict()
+        compact = dict()
+        for path, entry in page_authors.items():
+            compact[path] = self.compact_page(entry)
+        return compact
+
+    def compact_page(self, entry: dict) -> dict:
+        return dict(entry, authors=[self.compact(author) for author in entry["authors"]])
+
+    def compact(self, author: dict) -> Union[str, dict]:
+        # The first record seen for a login goes to the table, and variants are kept as is
+        record = {key: value for key, value in author.items() if key != "login"}
+        if author["login"] not in self.users:
+            self.users[author["login"]] = record
+            self.dirty_users.add(author["login"])
+        return author["login"] if self.users[author["login"]] == record else author
+
+    def expand_pages(self, page_authors: Dict[str, dict]) -> Dict[str, dict]:
+        """
+        Resolve the author references of every page. Pages referencing an
+        unknown login are dropped, so that they are fetched again.
+        Args:
+            page_authors (dict): cache entries by page path, as saved
+        Returns:
+            (dict): cache entries by page path, with full authors
+        """
+        expanded = dict()
+        for path, entry in page_authors.items():
+            entry = self.expand_page(entry)
+            if entry is not None:
+                expanded[path] = entry
+        return expanded
+
+    def expand_page(self, entry: dict) -> Optional[dict]:
+        authors = self.expand(entry["authors"])
+        return None if authors is None else dict(entry, authors=authors)
+
+    def expand(self, authors: List[Union[str, dict]]) -> Optional[List[dict]]:
+        expanded = []
+        for author in authors:
+            if isinstance(author, str):
+                if author not in self.users:
+                    return None
+                author = dict(login=author, **self.users[author])
+            expanded.append(author)
+        return expanded
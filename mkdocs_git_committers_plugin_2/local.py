@@ -0,0 +1,90 @@
+"""
+Module to turn the identities found in the local git history into
+contributors, for the `source: local` mode which makes no API call.
+"""
+import re
+from typing import Dict, List, Tuple
+
+import yaml
+
+# Emails GitHub and GitLab give to users who keep their email private
+NOREPLY_EMAIL = re.compile(r"^(?:\d+[+-])?([^@]+)@users\.noreply\.(?:github|gitlab)\.com$")
+
+# Committer of the commits made through the GitHub web interface
+WEB_FLOW = {"noreply@github.com": {"login": "web-flow"}}
+
+
+def load_identities(path: str) -> Dict[str, dict]:
+    """
+    Load a mapping file from git emails or names to contributors, e.g.
+        jane@example.com:
+          login: jane
+          name: Jane Doe
+          avatar: https://avatars.githubusercontent.com/u/1234
+    Args:
+        path (str): path of the YAML (or JSON) mapping file
+    Returns:
+        (dict): contributor fields by lowercase email or name
+    Raises:
+        ValueError: if the file is not a mapping of emails or names to contributor fields
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            identities = yaml.safe_load(f) or {}
+        except yaml.YAMLError as e:
+            raise ValueError(str(e))
+    if not isinstance(identities, dict):
+        raise ValueError("expected a mapping of git emails or names to contributors")
+    for key, value in identities.items():
+        if not isinstance(value, dict) or not all(isinstance(field, str) for field in value.values()):
+            raise ValueError(f"expected the fields of {key} (login, name, url, avatar) as a mapping of strings")
+    return {str(key).lower(): value for key, value in identities.items()}
+
+
+class LocalContributors:
+    """
+    Build contributors in the same form as the ones fetched from the GitHub
+    or GitLab API: {'login', 'name', 'url', 'avatar'}.
+    Identities missing from the mapping are only known by their git name.
+    """
+
+    def __init__(self, identities: Dict[str, dict], weburl: str, github: bool = True):
+        self.identities = dict(WEB_FLOW) if github else dict()
+        self.identities.update(identities)
+        self.weburl = weburl.rstrip("/") + "/"
+        self.github = github
+
+    def author(self, name: str, email: str) -> dict:
+        """
+        Args:
+            name (str): git author or committer name
+            email (str): git author or committer email
+        Returns:
+            (dict): contributor
+        """
+        identity = self.identities.get(email.lower()) or self.identities.get(name.lower())
+        if identity is None:
+            match = NOREPLY_EMAIL.match(email.lower())
+            identity = {"login": match.group(1)} if match else {}
+        login = identity.get("login")
+        if not login:
+            # Do not disclose the email in the site
+            return {"login": name, "name": name, "url": identity.get("url", ""), "avatar": identity.get("avatar", "")}
+        url = identity.get("url", self.weburl + login)
+        # GitHub serves the avatar of a user next to its profile
+        avatar = identity.get("avatar", url + ".png" if self.github and "url" not in identity else "")
+        return {"login": login, "name": identity.get("name", name), "url": url, "avatar": avatar}
+
+    def contributors(self, authors: List[Tuple[str, str]], coauthors: List[Tuple[str, str]]) -> List[dict]:
+        """
+        Args:
+            authors (list): (name, email) of the authors and committers, newest first
+            coauthors (list): (name, email) of the co-authors, newest first
+        Returns:
+            (list): unique contributors, authors and committers first, then co-authors
+        """
+        contributors = dict()
+        for name, email in authors + coauthors:
+            author = self.author(name, email)
+            contributors.setdefault(author["login"], author)
+        return list(contributors.values())
@@ -2,19 +2,30 @@ import os
 import logging
 from pprint import pprint
 from timeit import default_timer as timer
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import Future, ThreadPoolExecutor
 
 from mkdocs import utils as mkdocs_utils
 from mkdocs.config import config_options, Config
+from mkdocs.exceptions import ConfigurationError
 from mkdocs.plugins import BasePlugin
 
-from git import Repo, Commit
+from git import Repo
+from git.exc import GitCommandError
 import requests, json
 from requests.exceptions import HTTPError
 import time
 import re
+import threading
 
-from mkdocs_git_committers_plugin_2.exclude import exclude
+from mkdocs_git_committers_plugin_2.exclude import ExcludeMatcher
+from mkdocs_git_committers_plugin_2.authors import AuthorSet
+from mkdocs_git_committers_plugin_2.history import HistoryIndex
+from mkdocs_git_committers_plugin_2.scheduler import RequestScheduler
+from mkdocs_git_committers_plugin_2.local import LocalContributors, load_identities
+from mkdocs_git_committers_plugin_2.identities import IdentityCache
+from mkdocs_git_committers_plugin_2.cache import CACHE_BACKENDS, JsonCache, write_atomic
+from mkdocs_git_committers_plugin_2.timings import BuildTimings
 
 LOG = logging.getLogger("mkdocs.plugins." + __name__)
 
@@ -30,25 +41,67 @@ class GitCommittersPlugin(BasePlugin):
         ('docs_path', config_options.Type(str, default='docs/')),
         ('enabled', config_options.Type(bool, default=True)),
         ('cache_dir', config_options.Type(str, default='.cache/plugin/git-committers')),
+        ('cache_backend', config_options.Choice(tuple(CACHE_BACKENDS), default='json')),
         ("exclude", config_options.Type(list, default=[])),
         ("exclude_committers", config_options.Type(list, default=[])),
         ('token', config_options.Type(str, default='')),
+        ('max_concurrency', config_options.Type(int, default=4)),
+        ('graphql_batch_size', config_options.Type(int, default=0)),
+        ('max_retries', config_options.Type(int, default=5)),
+        ('max_rate_limit_wait', config_options.Type(int, default=600)),
+        ('empty_cache_ttl', config_options.Type(int, default=86400)),
+        ('identity_cache_ttl', config_options.Type(int, default=604800)),
+        ('source', config_options.Choice(('api', 'local'), default='api')),
+        ('identities_file', config_options.Type(str, default='')),
+        ('incremental_fetch', config_options.Type(bool, default=False)),
+        ('timings_report', config_options.Type(bool, default=False)),
+        ('serve_background_refresh', config_options.Type(bool, default=False)),
     )
 
     def __init__(self):
-        self.total_time = 0
+        self.timings = BuildTimings()
         self.branch = 'master'
         self.enabled = True
         self.authors = dict()
         self.cache_page_authors = dict()
-        self.exclude = list()
-        self.exclude_committers = list()
+        self.exclude = ExcludeMatcher([])
+        self.excluded_src_paths = set()
+        self.exclude_committers = set()
         self.cache_date = ''
-        self.last_request_return_code = 0
         self.githuburl = "https://api.github.com"
         self.gitlaburl = "https://gitlab.com/api/v4"
-        self.gitlabauthors_cache = dict()
-        self.should_save_cache = False
+        self.identities = IdentityCache()
+        # GitLab user searches in flight, by author name
+        self.gitlab_searches = dict()
+        self.gitlab_searches_lock = threading.Lock()
+        self.history = HistoryIndex()
+        self.submodules = list()
+        self.submodule_history = dict()
+        self.submodule_history_lock = threading.Lock()
+        self.page_contributors = dict()
+        self.graphql_batching = False
+        self.scheduler = RequestScheduler()
+        self.local = False
+        self.local_contributors = None
+        # Under mkdocs serve, this state is kept across rebuilds
+        self.serving = False
+        self.session = None
+        self.cache_key = None
+        self.refresh_thread = None
+        # Set to stop fetching the pages left, e.g. when mkdocs serve shuts down during a background refresh
+        self.stopping = threading.Event()
+
+    # Defining on_startup makes mkdocs keep the plugin instance across the rebuilds of mkdocs serve
+    def on_startup(self, *, command, dirty):
+        self.serving = command == 'serve'
+
+    def on_shutdown(self):
+        # The contributors fetched so far by the background refresh are saved with the others
+        self.stop_refresh()
+        if self.cache_key:
+            if self.cache_page_authors.changed:
+                self.cache_page_authors.save()
+            self.cache_page_authors.close()
 
     def on_config(self, config):
         self.enabled = self.config['enabled']
@@ -57,10 +110,19 @@ class GitCommittersPlugin(BasePlugin):
             return config
 
         LOG.info("git-committers plugin ENABLED")
+        # All API requests share one session, pooling as many connections as concurrent requests
+        if self.session is None or not self.serving:
+            self.session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(10, self.config['max_concurrency']))
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+        self.scheduler = RequestScheduler(session=self.session, max_retries=self.config['max_retries'],
+                                          max_wait=self.config['max_rate_limit_wait'])
         if not self.config['token'] and 'MKDOCS_GIT_COMMITTERS_APIKEY' in os.environ:
             self.config['token'] = os.environ['MKDOCS_GIT_COMMITTERS_APIKEY']
 
-        if not self.config['repository'] and not self.config['gitlab_repository']:
+        self.local = self.config['source'] == 'local'
+        if not self.config['repository'] and not self.config['gitlab_repository'] and not self.local:
             LOG.error("git-committers plugin: repository not specified")
             return config
         if self.config['enterprise_hostname'] and self.config['enterprise_hostname'] != '':
@@ -83,86 +145,115 @@ class GitCommittersPlugin(BasePlugin):
                 self.auth_header = {'Authorization': 'Bearer ' + self.config['token'] }
         else:
             self.auth_header = None
-            if self.config['gitlab_repository']:
+            if self.local:
+                LOG.info("git-committers: getting contributors from the local git history, without API calls")
+            elif self.config['gitlab_repository']:
                 LOG.error("git-committers plugin: GitLab API requires a token. Set it under 'token' mkdocs.yml config or MKDOCS_GIT_COMMITTERS_APIKEY environment variable.")
             else:
                 LOG.warning("git-committers plugin may require a GitHub token if you exceed the API rate limit or for private repositories. Set it under 'token' mkdocs.yml config or MKDOCS_GIT_COMMITTERS_APIKEY environment variable.")
         self.localrepo = Repo(".", search_parent_directories=True)
         self.branch = self.config['branch']
-        self.excluded_pages = self.config['exclude']
-        self.exclude_committers = self.config['exclude_committers']
+        # Globs are compiled once, and matched once per page
+        self.exclude = ExcludeMatcher(self.config['exclude'])
+        self.exclude_committers = set(self.config['exclude_committers'])
+        if self.local:
+            if self.config['gitlab_repository']:
+                weburl = "https://" + (self.config['gitlab_hostname'] or "gitlab.com")
+            else:
+                weburl = "https://" + (self.config['enterprise_hostname'] or "github.com")
+            try:
+                identities = load_identities(self.config['identities_file']) if self.config['identities_file'] else {}
+            except (OSError, ValueError) as e:
+                raise ConfigurationError("git-committers plugin: invalid identities_file " + self.config['identities_file'] + ": " + str(e))
+            self.local_contributors = LocalContributors(identities, weburl, github=not self.config['gitlab_repository'])
+        elif self.config['graphql_batch_size'] > 0:
+            if self.config['gitlab_repository']:
+                LOG.warning("git-committers: graphql_batch_size is ignored, since GraphQL batching is only available for GitHub.")
+            elif self.auth_header is None:
+                LOG.warning("git-committers: graphql_batch_size is ignored, since the GitHub GraphQL API requires a token. Set it under 'token' mkdocs.yml config or MKDOCS_GIT_COMMITTERS_APIKEY environment variable.")
+            else:
+                self.graphql_batching = True
         return config
 
-    # Get unique contributors for a given path
-    def get_contributors_to_file(self, path, submodule_repo=None):
-            # We already got a 401 (unauthorized) or 403 (rate limit) error, so we don't try again
-            if self.last_request_return_code == 403 or self.last_request_return_code == 401:
-                return []
+    # Get unique contributors for a given path, or None if they could not be fetched.
+    # If the cache entry of the path is given, it is revalidated with a conditional request,
+    # and updated with the validators (ETag, Last-Modified) of the new response.
+    # If since is given (ISO 8601), only the commits since then are fetched.
+    def get_contributors_to_file(self, path, submodule_repo=None, cache_entry=None, since=None):
+            # We already got a 401 (unauthorized) or 403 (forbidden, not rate limited) error, so we don't try again
+            if self.scheduler.auth_failed:
+                return None
             if self.config['gitlab_repository']:
-                # REST endpoint is in the form https://gitlab.com/api/v4/projects/[project ID]/repository/commits?path=[uri-encoded-path]&ref_name=[branch]
-                url = self.gitlaburl + "/projects/" + str(self.config['gitlab_repository']) + "/repository/commits?path=" +  requests.utils.quote(path) + "&ref_name=" + self.branch
+                # REST endpoint is in the form https://gitlab.com/api/v4/projects/[project ID]/repository/commits?path=[uri-encoded-path]&ref_name=[branch]&per_page=100
+                url = self.gitlaburl + "/projects/" + str(self.config['gitlab_repository']) + "/repository/commits?path=" +  requests.utils.quote(path) + "&ref_name=" + self.branch + "&per_page=100"
             else:
                 # Check git submodule
                 repository = submodule_repo or self.config['repository']
                 # REST endpoint is in the form https://api.github.com/repos/[repository]/commits?path=[uri-encoded-path]&sha=[branch]&per_page=100
                 url = self.githuburl + "/repos/" + repository + "/commits?path=" +  requests.utils.quote(path) + "&sha=" + self.branch + "&per_page=100"
-            authors = []
-            LOG.info("git-committers: fetching contributors for " + path)
-            r = requests.get(url=url, headers=self.auth_header)
-            self.last_request_return_code = r.status_code
+            if since:
+                url += "&since=" + requests.utils.quote(since)
+            authors = AuthorSet()
+            LOG.info("git-committers: fetching contributors for " + path + (" since " + since if since else ""))
+            headers = dict(self.auth_header or {})
+            # Conditional request: a 304 Not Modified response is not charged against the GitHub API rate limit
+            if cache_entry and cache_entry.get('etag') and not since:
+                headers['If-None-Match'] = cache_entry['etag']
+            if cache_entry and cache_entry.get('last_modified') and not since:
+                headers['If-Modified-Since'] = cache_entry['last_modified']
+            with self.timings.measure("rest"):
+                r = self.scheduler.get(url, headers=headers)
+            if r.status_code == 304:
+                LOG.info("git-committers: contributors for " + path + " not modified")
+                return list(cache_entry['authors'])
             if r.status_code == 200:
-                # Get login, url and avatar for each author. Ensure no duplicates.
+                if cache_entry is not None:
+                    cache_entry.pop('etag', None)
+                    cache_entry.pop('last_modified', None)
+                    # Validators of an incremental request do not apply to the whole history
+                    if r.headers.get('ETag') and not since:
+                        cache_entry['etag'] = r.headers['ETag']
+                    if r.headers.get('Last-Modified') and not since:
+                        cache_entry['last_modified'] = r.headers['Last-Modified']
                 res = r.json()
+                if cache_entry is not None:
+                    if res:
+                        if not self.config['gitlab_repository']:
+                            cache_entry.update(self.get_api_last_commit(res[0]['sha'], res[0]['commit']['author']['date']))
+                        else:
+                            cache_entry.update(self.get_api_last_commit(res[0]['id'], res[0]['authored_date']))
+                    elif not since:
+                        # The API has no commit of the path
+                        cache_entry.pop('last_commit', None)
+                # Follow the pagination Link header, for paths with more than 100 commits
+                while 'next' in r.links:
+                    with self.timings.measure("rest"):
+                        r = self.scheduler.get(r.links['next']['url'], headers=self.auth_header)
+                    if r.status_code != 200:
+                        break
+                    res.extend(r.json())
+            if r.status_code == 200:
+                # Get login, url and avatar for each author. Ensure no duplicates.
                 github_coauthors_exist = False
                 for commit in res:
                     if not self.config['gitlab_repository']:
                         # GitHub
-                        if commit['author'] and commit['author']['login'] and commit['author']['login'] not in [author['login'] for author in authors]:
-                            authors.append({'login': commit['author']['login'],
-                                            'name': commit['author']['login'],
-                                            'url': commit['author']['html_url'],
-                                            'avatar': commit['author']['avatar_url'] if commit['author']['avatar_url'] is not None else ''
-                                            })
-                        if commit['committer'] and commit['committer']['login'] and commit['committer']['login'] not in [author['login'] for author in authors]:
-                            authors.append({'login': commit['committer']['login'],
-                                            'name': commit['committer']['login'],
-                                            'url': commit['committer']['html_url'],
-                                            'avatar': commit['committer']['avatar_url'] if commit['committer']['avatar_url'] is not None else ''
-                                            })
+                        for user in (commit['author'], commit['committer']):
+                            if user and user['login']:
+                                authors.add(user['login'], user['login'], user['html_url'], user['avatar_url'])
                         if commit['commit'] and commit['commit']['message'] and '\nCo-authored-by:' in commit['commit']['message']:
                             github_coauthors_exist = True
                     else:
                         # GitLab
                         if commit['author_name']:
-                            # If author is not already in the list of authors
-                            if commit['author_name'] not in [author['name'] for author in authors]:
-                                # Look for GitLab author in our cache self.gitlabauthors. If not found fetch it from GitLab API and save it in cache.
-                                if commit['author_name'] in self.gitlabauthors_cache:
-                                    authors.append({'login': self.gitlabauthors_cache[commit['author_name']]['username'],
-                                                    'name': commit['author_name'],
-                                                    'url': self.gitlabauthors_cache[commit['author_name']]['web_url'],
-                                                    'avatar': self.gitlabauthors_cache[commit['author_name']]['avatar_url'] if self.gitlabauthors_cache[commit['author_name']]['avatar_url'] is not None else ''
-                                                    })
-                                else:
-                                    # Fetch author from GitLab API
-                                    url = self.gitlaburl + "/users?search=" + requests.utils.quote(commit['author_name'])
-                                    r = requests.get(url=url, headers=self.auth_header)
-                                    if r.status_code == 200:
-                                        res = r.json()
-                                        if len(res) > 0:
-                                            # Go through all users until we find the one with the same name
-                                            for user in res:
-                                                if user['name'] == commit['author_name']:
-                                                    # Save it in cache
-                                                    self.gitlabauthors_cache[commit['author_name']] = user
-                                                    authors.append({'login': user['username'],
-                                                                    'name': user['name'],
-                                                                    'url': user['web_url'],
-                                                                    'avatar': user['avatar_url'] if user['avatar_url'] is not None else ''
-                                                                    })
-                                                    break
-                                    else:
-                                        LOG.error("git-committers:   " + str(r.status_code) + " " + r.reason)
+                            # If author name was not already seen
+                            if authors.add_name(commit['author_name']):
+                                # Look for GitLab author in the identity cache. If not found fetch it from GitLab API and save it in cache.
+                                found, user = self.identities.get_search(commit['author_name'])
+                                if not found:
+                                    user = self.search_gitlab_user(commit['author_name'])
+                                if user:
+                                    authors.add(user['username'], commit['author_name'], user['web_url'], user['avatar_url'])
                 if github_coauthors_exist:
                     github_coauthors_count = 0
                     # Get co-authors info through the GraphQL API, which is not available in the REST API
@@ -172,21 +263,32 @@ class GitCommittersPlugin(BasePlugin):
                         LOG.info("git-committers: fetching contributors for " + path + " using GraphQL API")
                         # Query GraphQL API, and get a list of unique authors
                         url = self.githuburl + "/graphql"
-                        query = {
-                                "query": """
-                                {
-                                  repository(owner: "%s", name: "%s") {
-                                    object(expression: "%s") {
-                                      ... on Commit {
-                                        history(first: 100, path: "%s") {
-                                          nodes {
-                                            authors(first: 100) {
+                        history_args = ', since: "%s"' % since if since else ''
+                        cursor = None
+                        while True:
+                            # Follow the history cursor, for paths with more than 100 commits
+                            after = ', after: "%s"' % cursor if cursor else ''
+                            query = {
+                                    "query": """
+                                    {
+                                      repository(owner: "%s", name: "%s") {
+                                        object(expression: "%s") {
+                                          ... on Commit {
+                                            history(first: 100, path: "%s"%s%s) {
+                                              pageInfo {
+                                                hasNextPage
+                                                endCursor
+                                              }
                                               nodes {
-                                                user {
-                                                  login
-                                                  name
-                                                  url
-                                                  avatarUrl
+                                                authors(first: 100) {
+                                                  nodes {
+                                                    user {
+                                                      login
+                                                      name
+                                                      url
+                                                      avatarUrl
+                                                    }
+                                                  }
                                                 }
                                               }
                                             }
@@ -194,106 +296,466 @@ class GitCommittersPlugin(BasePlugin):
                                         }
                                       }
                                     }
-                                  }
-                                }
-                                """ % (self.config['repository'].split('/')[0], self.config['repository'].split('/')[1], self.branch, path)
-                        }
-                        r = requests.post(url=url, json=query, headers=self.auth_header)
-                        res = r.json()
-                        if r.status_code == 200:
-                            if res.get('data'):
-                                if res['data']['repository']['object']['history']['nodes']:
-                                    for history_node in res['data']['repository']['object']['history']['nodes']:
-                                        for author_node in history_node['authors']['nodes']:
-                                            # If user is not None (GitHub user was deleted)
-                                            if author_node['user']:
-                                                if author_node['user']['login'] not in [author['login'] for author in authors]:
-                                                    authors.append({'login': author_node['user']['login'],
-                                                                    'name': author_node['user']['name'],
-                                                                    'url': author_node['user']['url'],
-                                                                    'avatar': author_node['user']['avatarUrl']})
-                                                    github_coauthors_count += 1
-                            else:
+                                    """ % (self.config['repository'].split('/')[0], self.config['repository'].split('/')[1], self.branch, path, history_args, after)
+                            }
+                            with self.timings.measure("graphql"):
+                                r = self.scheduler.post(url, json=query, headers=self.auth_header)
+                            if r.status_code != 200:
+                                break
+                            res = r.json()
+                            if not res.get('data'):
                                 LOG.warning("git-committers: Error from GitHub GraphQL call: " + res['errors'][0]['message'])
+                                break
+                            history = res['data']['repository']['object']['history']
+                            for history_node in history['nodes']:
+                                for author_node in history_node['authors']['nodes']:
+                                    # If user is not None (GitHub user was deleted)
+                                    user = author_node['user']
+                                    if user and authors.add(user['login'], user['name'], user['url'], user['avatarUrl']):
+                                        github_coauthors_count += 1
+                            if not history['pageInfo']['hasNextPage']:
+                                break
+                            cursor = history['pageInfo']['endCursor']
                     LOG.info(f"git-committers: added {github_coauthors_count} co-authors")
-                return authors
+                return authors.to_list()
             else:
                 LOG.error("git-committers: error fetching contributors for " + path)
                 if r.status_code == 403 or r.status_code == 401:
                     LOG.error("git-committers:   " + str(r.status_code) + " " + r.reason + " - You may have exceeded the API rate limit or need to be authorized. You can set a token under 'token' mkdocs.yml config or MKDOCS_GIT_COMMITTERS_APIKEY environment variable.")
                 else:
                     LOG.error("git-committers:   " + str(r.status_code) + " " + r.reason)
-                return []
-            return []
+                return None
+            return None
         
-    def list_contributors(self, path):
-        last_commit_date = ""
-        path = path.replace("\\", "/")
-        for c in Commit.iter_items(self.localrepo, self.localrepo.head, path):
-            if not last_commit_date:
-                # Use the last commit and get the date
-                last_commit_date = time.strftime("%Y-%m-%d", time.gmtime(c.authored_date))
+    # Search a GitLab user by name, and save the result in the identity cache, even if nobody was found
+    def search_gitlab_user(self, name):
+        # Pages are prefetched concurrently: pages sharing an author wait for its search instead of sending their own
+        with self.gitlab_searches_lock:
+            found, user = self.identities.get_search(name)
+            if found:
+                return user
+            search = self.gitlab_searches.get(name)
+            searching = search is None
+            if searching:
+                search = self.gitlab_searches[name] = Future()
+        if not searching:
+            return search.result()
+        try:
+            user = self.fetch_gitlab_user(name)
+            search.set_result(user)
+        except BaseException as e:
+            search.set_exception(e)
+            raise
+        finally:
+            with self.gitlab_searches_lock:
+                del self.gitlab_searches[name]
+        return user
+
+    def fetch_gitlab_user(self, name):
+        url = self.gitlaburl + "/users?search=" + requests.utils.quote(name)
+        with self.timings.measure("gitlab_search"):
+            r = self.scheduler.get(url, headers=self.auth_header)
+        if r.status_code != 200:
+            LOG.error("git-committers:   " + str(r.status_code) + " " + r.reason)
+            return None
+        # Go through all users until we find the one with the same name
+        user = next((user for user in r.json() if user['name'] == name), None)
+        self.identities.set_search(name, user)
+        return user
+
+    # Build a GraphQL query with an aliased history field per (alias index, path, since, cursor)
+    def get_histories_query(self, repository, histories):
+        user_fields = "user { login name url avatarUrl }"
+        history_fields = []
+        for i, path, since, cursor in histories:
+            args = "first: 100, path: " + json.dumps(path)
+            if since:
+                args += ", since: " + json.dumps(since)
+            if cursor:
+                args += ", after: " + json.dumps(cursor)
+            history_fields.append("p%d: history(%s) { pageInfo { hasNextPage endCursor } nodes { oid authoredDate committer { %s } authors(first: 100) { nodes { %s } } } }"
+                                  % (i, args, user_fields, user_fields))
+        return {
+            "query": "{ repository(owner: %s, name: %s) { object(expression: %s) { ... on Commit { %s } } } }"
+                     % (json.dumps(repository.split('/')[0]), json.dumps(repository.split('/')[1]), json.dumps(self.branch), " ".join(history_fields))
+        }
+
+    # Get unique contributors for many paths in one request, with an aliased GraphQL history field per path.
+    # If sinces is given, only the commits since the ISO 8601 date of each path are fetched.
+    # Returns the authors and the newest commit (empty without commits) by path, without the paths which could not be fetched.
+    def get_contributors_to_files(self, paths, repository=None, sinces=None):
+        if self.scheduler.auth_failed:
+            return {}
+        repository = repository or self.config['repository']
+        sinces = sinces or [None] * len(paths)
+        query = self.get_histories_query(repository, [(i, path, sinces[i], None) for i, path in enumerate(paths)])
+        LOG.info(f"git-committers: fetching contributors for {len(paths)} paths using GraphQL API")
+        with self.timings.measure("graphql"):
+            r = self.scheduler.post(self.githuburl + "/graphql", json=query, headers=self.auth_header)
+        res = r.json() if r.status_code == 200 else {}
+        errors = res.get('errors') or []
+        too_complex = r.status_code in (502, 504) or any(error.get('type') in ('MAX_NODE_LIMIT_EXCEEDED', 'RESOURCE_LIMITS_EXCEEDED')
+                                                         or 'complexity' in error.get('message', '') for error in errors)
+        if too_complex and len(paths) > 1:
+            # Split the batch until GitHub accepts it
+            LOG.info(f"git-committers: GraphQL query for {len(paths)} paths is too complex, splitting it")
+            half = len(paths) // 2
+            authors_by_path = self.get_contributors_to_files(paths[:half], repository, sinces[:half])
+            authors_by_path.update(self.get_contributors_to_files(paths[half:], repository, sinces[half:]))
+            return authors_by_path
+        if r.status_code != 200 or not res.get('data') or not res['data']['repository'] or not res['data']['repository']['object']:
+            LOG.error("git-committers: error fetching contributors for " + str(len(paths)) + " paths using GraphQL API")
+            if r.status_code == 403 or r.status_code == 401:
+                LOG.error("git-committers:   " + str(r.status_code) + " " + r.reason + " - You may have exceeded the API rate limit or need to be authorized. You can set a token under 'token' mkdocs.yml config or MKDOCS_GIT_COMMITTERS_APIKEY environment variable.")
+            elif errors:
+                LOG.error("git-committers:   " + errors[0]['message'])
+            else:
+                LOG.error("git-committers:   " + str(r.status_code) + " " + r.reason)
+            return {}
+
+        history_nodes, cursors = dict(), dict()
+        pending = range(len(paths))
+        while True:
+            for i in pending:
+                history = res['data']['repository']['object'].get('p%d' % i)
+                if history is None:
+                    history_nodes.pop(i, None)
+                    cursors.pop(i, None)
+                    continue
+                history_nodes.setdefault(i, []).extend(history['nodes'])
+                if history['pageInfo']['hasNextPage']:
+                    cursors[i] = history['pageInfo']['endCursor']
+                else:
+                    cursors.pop(i, None)
+            if not cursors:
+                break
+            pending = list(cursors)
+            # Follow the history cursors of the paths with more than 100 commits
+            query = self.get_histories_query(repository, [(i, paths[i], sinces[i], cursor) for i, cursor in cursors.items()])
+            with self.timings.measure("graphql"):
+                r = self.scheduler.post(self.githuburl + "/graphql", json=query, headers=self.auth_header)
+            res = r.json() if r.status_code == 200 else {}
+            if not res.get('data') or not res['data']['repository'] or not res['data']['repository']['object']:
+                LOG.error(f"git-committers: error fetching the next commits of {len(cursors)} paths using GraphQL API")
+                # Incomplete histories are fetched one by one afterwards
+                for i in cursors:
+                    del history_nodes[i]
+                break
+
+        authors_by_path = dict()
+        for i, nodes in history_nodes.items():
+            path = paths[i]
+            # Same order as the REST API: authors and committers of each commit, then co-authors
+            authors, coauthors = AuthorSet(), []
+            for history_node in nodes:
+                author_nodes = history_node['authors']['nodes']
+                users = [author_nodes[0]['user'] if author_nodes else None]
+                if history_node['committer']:
+                    users.append(history_node['committer']['user'])
+                for user in users:
+                    if user:
+                        authors.add(user['login'], user['login'], user['url'], user['avatarUrl'])
+                for author_node in author_nodes[1:]:
+                    # If user is not None (GitHub user was deleted)
+                    if author_node['user']:
+                        coauthors.append(author_node['user'])
+            for user in coauthors:
+                authors.add(user['login'], user['name'], user['url'], user['avatarUrl'])
+            last_commit = self.get_api_last_commit(nodes[0]['oid'], nodes[0]['authoredDate']) if nodes else {}
+            authors_by_path[path] = (authors.to_list(), last_commit)
+        return authors_by_path
+
+    # Get the history index of a submodule, built on first use
+    def get_submodule_history(self, submodule):
+        # Pages are prefetched concurrently: only index each submodule once
+        with self.submodule_history_lock:
+            if submodule.path not in self.submodule_history:
+                LOG.info("git-committers: indexing git history of submodule " + submodule.path)
+                with self.timings.measure("git"):
+                    self.submodule_history[submodule.path] = HistoryIndex.build(submodule.module(), with_authors=self.local)
+            return self.submodule_history[submodule.path]
+
+    # Get the last commit date and SHA of a path, and the GitHub submodule holding it if any.
+    # With the local source, any submodule is used, and it is identified by its path instead.
+    def get_last_commit(self, path):
+        # Use the last commit and get the date
+        last_commit = self.history.get(path)
 
         # Check if the file is in a git submodule on GitHub
         submodule_repo, path_in_submodule = None, None
-        if last_commit_date == "" and not self.config['gitlab_repository']:
-            for submodule in self.localrepo.submodules:
+        if not last_commit and (self.local or not self.config['gitlab_repository']):
+            for submodule in self.submodules:
                 if submodule_repo:
                     break
                 if not path.startswith(submodule.path):
                     continue
                 match = re.match(r"https:\/\/github\.com\/([^\/]+\/[^\/.]+)", submodule.url)
-                if not match:
+                if not match and not self.local:
                     LOG.warning("git-committers: Submodule matched but will not be queried, since it isn't a GitHub repo.")
                     continue
                 path_in_submodule = path[len(submodule.path)+1:]
-                for c in Commit.iter_items(submodule.module(), submodule.module().head, path_in_submodule):
-                    if not last_commit_date:
-                        # Use the last commit and get the date
-                        submodule_repo = match.group(1)
-                        last_commit_date = time.strftime("%Y-%m-%d", time.gmtime(c.authored_date))
+                last_commit = self.get_submodule_history(submodule).get(path_in_submodule)
+                if last_commit:
+                    submodule_repo = submodule.path if self.local else match.group(1)
+
+        if not last_commit:
+            return "", "", submodule_repo, path_in_submodule
+        last_commit_sha, last_commit_time = last_commit
+        return time.strftime("%Y-%m-%d", time.gmtime(last_commit_time)), last_commit_sha, submodule_repo, path_in_submodule
+
+    # Get the authors and last commit date of a path from the cache, or None if they must be fetched
+    def get_cached_contributors(self, path, last_commit_date, last_commit_sha):
+        entry = self.cache_page_authors.get(path)
+        if not entry:
+            return None
+        if 'last_commit' in entry:
+            # The cache is valid as long as no commit touched the path since
+            if entry['last_commit'] != last_commit_sha:
+                return None
+            # No authors may come from a transient API issue: only trust it for a while
+            if not entry['authors'] and time.time() - entry.get('cached_at', 0) > self.config['empty_cache_ttl']:
+                return None
+            return entry['authors'], last_commit_date
+        # Entry cached before commit SHAs were: use it if cache date is newer than last commit date
+        if self.cache_date and time.strptime(last_commit_date, "%Y-%m-%d") < time.strptime(self.cache_date, "%Y-%m-%d"):
+            # If page_autors in cache is not empty, return it
+            if entry['authors']:
+                self.cache_page_authors[path] = dict(entry, last_commit=last_commit_sha)
+                return entry['authors'], entry['last_commit_date']
+        return None
+
+    # Remove excluded committers from a list of authors
+    def remove_excluded_committers(self, authors):
+        if self.exclude_committers:
+            authors[:] = [author for author in authors if author["login"] not in self.exclude_committers]
+        return authors
+
+    # Get unique contributors for a given path from the local git history
+    def get_local_contributors(self, path, submodule_path=None, path_in_submodule=None):
+        if submodule_path:
+            history, path = self.submodule_history[submodule_path], path_in_submodule
+        else:
+            history = self.history
+        return self.local_contributors.contributors(*history.contributors(path))
+
+    # Get the cache entry fields of the newest commit of a path returned by the API, dated in UTC like the local history
+    def get_api_last_commit(self, sha, timestamp):
+        date = datetime.fromisoformat(timestamp.replace("Z", "+00:00")).astimezone(timezone.utc)
+        return {'last_commit': sha, 'last_commit_date': date.strftime("%Y-%m-%d")}
+
+    # Get the date since which the commits of a path must be fetched to update its cache entry, or None for all of them
+    def get_fetch_since(self, cache_entry):
+        if not self.config['incremental_fetch'] or not cache_entry or not cache_entry.get('last_commit'):
+            return None
+        # Commits are filtered by day: the ones of the last cached day are fetched again
+        return cache_entry['last_commit_date'] + "T00:00:00Z"
+
+    # Merge the authors of the new commits of a path with its cached authors, newest first
+    def merge_contributors(self, authors, cached_authors):
+        logins = set(author['login'] for author in authors)
+        return authors + [author for author in cached_authors if author['login'] not in logins]
+
+    # Remove excluded committers from the fetched authors of a path, and save them in the cache.
+    # The entry is stamped with the newest commit returned by the API, not the local one, which may not be pushed yet:
+    # it is fetched again until the API has the local last commit.
+    def save_contributors(self, path, authors, validators=None):
+        self.remove_excluded_committers(authors)
+
+        entry = {'last_commit_date': '', 'last_commit': None, 'cached_at': int(time.time()), 'authors': authors}
+        for key in ('last_commit', 'last_commit_date', 'etag', 'last_modified'):
+            if validators and key in validators:
+                entry[key] = validators[key]
+        self.cache_page_authors[path] = entry
+
+        return authors
+
+    # Get the cached authors of a path, even if outdated, while they are refreshed in the background
+    def get_stale_contributors(self, path):
+        path = path.replace("\\", "/")
+        last_commit_date, _, _, _ = self.get_last_commit(path)
+        entry = self.cache_page_authors.get(path)
+        return (entry['authors'] if entry else []), last_commit_date or datetime.now().strftime("%Y-%m-%d")
+
+    # Tell whether the contributors of a path must be fetched from the API
+    def needs_fetch(self, path):
+        if self.local:
+            return False
+        last_commit_date, last_commit_sha, _, _ = self.get_last_commit(path)
+        return last_commit_date != "" and self.get_cached_contributors(path, last_commit_date, last_commit_sha) is None
+
+    def list_contributors(self, path):
+        path = path.replace("\\", "/")
+        last_commit_date, last_commit_sha, submodule_repo, path_in_submodule = self.get_last_commit(path)
 
         # File not committed yet
         if last_commit_date == "":
             last_commit_date = datetime.now().strftime("%Y-%m-%d")
             return [], last_commit_date
 
-        # Use the cache if present if cache date is newer than last commit date
-        if path in self.cache_page_authors:
-            if self.cache_date and time.strptime(last_commit_date, "%Y-%m-%d") < time.strptime(self.cache_date, "%Y-%m-%d"):
-                # If page_autors in cache is not empty, return it
-                if self.cache_page_authors[path]['authors']:
-                    return self.cache_page_authors[path]['authors'], self.cache_page_authors[path]['last_commit_date']
+        # No API call, hence no cache, with the local source
+        if self.local:
+            authors = self.get_local_contributors(path, submodule_repo, path_in_submodule)
+            return self.remove_excluded_committers(authors), last_commit_date
 
+        cached = self.get_cached_contributors(path, last_commit_date, last_commit_sha)
+        if cached is not None:
+            self.timings.count("cache_hits")
+            return cached
+        self.timings.count("cache_misses")
+        start = timer()
+
+        # Revalidate the authors in the cache, if any, instead of fetching them again
+        cache_entry = dict(self.cache_page_authors.get(path, {}))
+        # Or only fetch the commits since the cached ones
+        since = self.get_fetch_since(cache_entry)
         authors=[]
         if not submodule_repo:
-            authors = self.get_contributors_to_file(path)
+            authors = self.get_contributors_to_file(path, cache_entry=cache_entry, since=since)
         else:
             LOG.info("git-committers: fetching submodule info for " + path + " from repository " + submodule_repo + " with path " + path_in_submodule)
-            authors = self.get_contributors_to_file(path_in_submodule, submodule_repo=submodule_repo)
+            authors = self.get_contributors_to_file(path_in_submodule, submodule_repo=submodule_repo, cache_entry=cache_entry, since=since)
+        self.timings.page(path, timer() - start)
+        if authors is None:
+            # Keep the authors in the cache, if any, but fetch them again on the next build
+            return cache_entry.get('authors', []), last_commit_date
+        if since:
+            authors = self.merge_contributors(authors, cache_entry['authors'])
 
-        for exclude_committer in set(self.exclude_committers):
-            for author in tuple(authors):
-                if author["login"] == exclude_committer:
-                    authors.remove(author)
-                    break
+        return self.save_contributors(path, authors, cache_entry), last_commit_date
+
+    # Fetch, in GraphQL batches, the contributors of the pages which are neither uncommitted nor cached
+    def batch_contributors(self, git_paths, executor, expect=True):
+        batches = dict()
+        for git_path in git_paths:
+            path = git_path.replace("\\", "/")
+            last_commit_date, last_commit_sha, submodule_repo, path_in_submodule = self.get_last_commit(path)
+            if last_commit_date == "" or self.get_cached_contributors(path, last_commit_date, last_commit_sha) is not None:
+                continue
+            repository = submodule_repo or self.config['repository']
+            cache_entry = self.cache_page_authors.get(path)
+            batches.setdefault(repository, []).append((git_path, path_in_submodule if submodule_repo else path, last_commit_date,
+                                                       self.get_fetch_since(cache_entry), cache_entry))
+
+        batch_size = self.config['graphql_batch_size']
+        jobs = [(repository, pages[i:i + batch_size]) for repository, pages in batches.items() for i in range(0, len(pages), batch_size)]
+
+        if expect:
+            self.scheduler.expect(len(jobs))
+
+        def fetch(job):
+            repository, pages = job
+            if self.stopping.is_set():
+                return pages, dict()
+            return pages, self.get_contributors_to_files([page[1] for page in pages], repository, [page[3] for page in pages])
+
+        for pages, authors_by_path in executor.map(fetch, jobs):
+            for git_path, repository_path, last_commit_date, since, cache_entry in pages:
+                # Pages missing from a failed batch are fetched one by one afterwards
+                if repository_path in authors_by_path:
+                    self.timings.count("cache_misses")
+                    authors, last_commit = authors_by_path[repository_path]
+                    if since:
+                        authors = self.merge_contributors(authors, cache_entry['authors'])
+                        # Without new commits, the cached one is still the newest
+                        last_commit = last_commit or {key: cache_entry[key] for key in ('last_commit', 'last_commit_date')}
+                    authors = self.save_contributors(git_path.replace("\\", "/"), authors, last_commit)
+                    self.page_contributors[git_path] = (authors, last_commit_date)
 
-        if path not in self.cache_page_authors or self.cache_page_authors[path] != {'last_commit_date': last_commit_date, 'authors': authors}:
-            self.should_save_cache = True
-            self.cache_page_authors[path] = {'last_commit_date': last_commit_date, 'authors': authors}
+    # Get the git paths of the pages which are not excluded
+    def get_page_paths(self, files):
+        return [self.config['docs_path'] + file.src_path for file in files.documentation_pages()
+                if not self.exclude(file.src_path)]
 
-        return authors, last_commit_date
+    # Number of requests needed to fetch the contributors of `count` pages, at least
+    def expected_requests(self, count):
+        if self.graphql_batching:
+            return -(-count // self.config['graphql_batch_size'])
+        return count
+
+    # Fetch the contributors of pages concurrently, into self.page_contributors
+    # With expect=False, the caller announces the requests to the scheduler, e.g. for all the chunks of pages it fetches
+    def prefetch_contributors(self, git_paths, expect=True):
+        def list_contributors(git_path):
+            # Pages left once stopping are not fetched, and not listed in self.page_contributors
+            if self.stopping.is_set():
+                return None
+            return self.list_contributors(git_path)
+
+        with ThreadPoolExecutor(max_workers=max(1, self.config['max_concurrency'])) as executor:
+            if self.graphql_batching:
+                self.batch_contributors(git_paths, executor, expect)
+            git_paths_left = [git_path for git_path in git_paths if git_path not in self.page_contributors]
+            if expect:
+                self.scheduler.expect(sum(1 for git_path in git_paths_left if self.needs_fetch(git_path.replace("\\", "/"))))
+            for git_path, result in zip(git_paths_left, executor.map(list_contributors, git_paths_left)):
+                if result is not None:
+                    self.page_contributors[git_path] = result
+
+    # Fetch the contributors of pages in a background thread, and save the cache once done
+    def refresh_contributors(self, git_paths):
+        def refresh():
+            start = timer()
+            self.prefetch_contributors(git_paths)
+            if self.cache_page_authors.changed:
+                self.cache_page_authors.save()
+            if self.stopping.is_set():
+                LOG.info(f"git-committers: stopped refreshing contributors after {timer() - start:.2f}s")
+                return
+            LOG.info(f"git-committers: refreshed contributors of {len(git_paths)} pages in {timer() - start:.2f}s, "
+                     "they are shown from the next rebuild")
+
+        LOG.info(f"git-committers: refreshing contributors of {len(git_paths)} pages in the background")
+        self.refresh_thread = threading.Thread(target=refresh, daemon=True)
+        self.refresh_thread.start()
+
+    # Stop the background refresh, if any: only the pages being fetched are waited for
+    def stop_refresh(self):
+        if self.refresh_thread:
+            self.stopping.set()
+            self.refresh_thread.join()
+            self.refresh_thread = None
+            self.stopping.clear()
+
+    @property
+    def refreshing(self):
+        return self.refresh_thread is not None and self.refresh_thread.is_alive()
+
+    def on_files(self, files, config):
+        # Under mkdocs serve, on_pre_build only drops the contributors of the pages changed since the last build
+        if not self.serving:
+            self.page_contributors = dict()
+        if not self.enabled:
+            return files
+        # Excluded pages are skipped from the git and API work, and looked up in on_page_context
+        self.excluded_src_paths = set(file.src_path for file in files.documentation_pages() if self.exclude(file.src_path))
+        # Prefetch contributors of all pages concurrently, so that on_page_context only reads them from memory
+        git_paths = [git_path for git_path in self.get_page_paths(files) if git_path not in self.page_contributors]
+        if self.serving and self.config['serve_background_refresh'] and not self.local:
+            # Do not make the rebuild wait for the API: pages show their cached contributors meanwhile
+            if git_paths and not self.refreshing:
+                self.refresh_contributors(git_paths)
+            return files
+        start = timer()
+        with self.timings.measure("prefetch"):
+            self.prefetch_contributors(git_paths)
+        LOG.info(f"git-committers: prefetched contributors of {len(git_paths)} pages in {timer() - start:.2f}s")
+        return files
 
     def on_page_context(self, context, page, config, nav):
         context['committers'] = []
         if not self.enabled:
             return context
-        if exclude(page.file.src_path, self.excluded_pages):
+        if page.file.src_path in self.excluded_src_paths:
             LOG.info("git-committers: " + page.file.src_path + " is excluded")
             return context
         start = timer()
         git_path = self.config['docs_path'] + page.file.src_path
-        authors, last_commit_date = self.list_contributors(git_path)
+        if git_path in self.page_contributors:
+            authors, last_commit_date = self.page_contributors[git_path]
+        elif self.serving and self.config['serve_background_refresh'] and not self.local:
+            authors, last_commit_date = self.get_stale_contributors(git_path)
+        else:
+            authors, last_commit_date = self.list_contributors(git_path)
         if authors:
             context['committers'] = authors
         if last_commit_date:
@@ -302,26 +764,84 @@ class GitCommittersPlugin(BasePlugin):
             context['committers_source'] = 'github'
         else:
             context['committers_source'] = 'gitlab'
-        end = timer()
-        self.total_time += (end - start)
+        self.timings.add("page_context", timer() - start)
 
         return context
 
     def on_post_build(self, config):
-        if not self.should_save_cache:
+        if self.enabled and self.scheduler.requests:
+            LOG.info("git-committers: " + self.scheduler.stats())
+        # The background refresh saves the cache itself once done
+        if self.cache_page_authors.changed and not self.refreshing:
+            with self.timings.measure("cache_save"):
+                self.cache_page_authors.save()
+        if not self.enabled:
             return
-        LOG.info("git-committers: saving page authors cache file")
-        json_data = json.dumps({'cache_date': datetime.now().strftime("%Y-%m-%d"), 'page_authors': self.cache_page_authors})
-        os.makedirs(self.config['cache_dir'], exist_ok=True)
-        f = open(self.config['cache_dir'] + "/page-authors.json", "w")
-        f.write(json_data)
-        f.close()
+        for line in self.timings.summary():
+            LOG.info("git-committers: " + line)
+        if self.config['timings_report']:
+            report = self.timings.report()
+            report['requests'] = {'total': self.scheduler.requests, 'retries': self.scheduler.retries,
+                                  'throttled_seconds': round(self.scheduler.throttled_time, 3)}
+            os.makedirs(self.config['cache_dir'], exist_ok=True)
+            write_atomic(self.config['cache_dir'] + "/build-timings.json", json.dumps(report, indent=2))
 
     def on_pre_build(self, config):
-        if os.path.exists(self.config['cache_dir'] + "/page-authors.json"):
-            LOG.info("git-committers: found page authors cache file - loading it")
-            f = open(self.config['cache_dir'] + "/page-authors.json", "r")
-            cache = json.loads(f.read())
-            self.cache_date = cache['cache_date']
-            self.cache_page_authors = cache['page_authors']
-            f.close()
+        self.timings = BuildTimings()
+        # Without API calls, nothing is cached: the cache is neither loaded nor created
+        use_cache = self.enabled and not self.local
+        # Under mkdocs serve, the cache stays in memory across rebuilds
+        cache_key = (self.config['cache_dir'], self.config['cache_backend'], self.config['identity_cache_ttl'], use_cache)
+        if not self.serving or cache_key != self.cache_key:
+            if self.cache_key:
+                # The background refresh saves what it fetched into the cache it was started with
+                self.stop_refresh()
+                self.cache_page_authors.close()
+            self.identities = IdentityCache(ttl=self.config['identity_cache_ttl'])
+            if use_cache:
+                self.cache_page_authors = CACHE_BACKENDS[self.config['cache_backend']](self.config['cache_dir'], self.identities)
+                with self.timings.measure("cache_load"):
+                    self.cache_page_authors.load()
+            else:
+                # Empty, and left unchanged
+                self.cache_page_authors = JsonCache(self.config['cache_dir'], self.identities)
+            self.cache_date = self.cache_page_authors.cache_date
+            self.cache_key = cache_key
+        if not self.enabled:
+            return
+        start = timer()
+        with self.timings.measure("git"):
+            changed_paths = self.update_history()
+        if changed_paths is None:
+            self.page_contributors = dict()
+            LOG.info(f"git-committers: indexed git history of {len(self.history)} files in {timer() - start:.2f}s")
+        elif changed_paths:
+            # Pages outside of the index may be in a submodule, which may have moved too
+            self.page_contributors = {git_path: result for git_path, result in self.page_contributors.items()
+                                      if git_path.replace("\\", "/") in self.history and git_path.replace("\\", "/") not in changed_paths}
+            LOG.info(f"git-committers: indexed {len(changed_paths)} files changed since the last build in {timer() - start:.2f}s")
+
+    # Index the git history once, instead of walking it for every page.
+    # Under mkdocs serve, only the new commits are indexed when HEAD moved forward since the last build.
+    # Returns the paths changed since the last build, or None if the whole history was indexed.
+    def update_history(self):
+        if self.serving and self.history.head and self.history.with_authors == self.local:
+            try:
+                head = self.localrepo.head.commit.hexsha
+                if head == self.history.head:
+                    return set()
+                # The background refresh reads the index and fills self.page_contributors: on_files restarts it for the pages left
+                self.stop_refresh()
+                if self.localrepo.is_ancestor(self.history.head, head):
+                    changed_paths = self.history.update(self.localrepo, head, self.config['docs_path'])
+                    self.submodules = list(self.localrepo.submodules)
+                    self.submodule_history = dict()
+                    return changed_paths
+            except (ValueError, GitCommandError):
+                pass
+        self.stop_refresh()
+        self.history = HistoryIndex.build(self.localrepo, self.config['docs_path'], with_authors=self.local)
+        # Listed once: GitPython objects must not be read concurrently by the prefetching threads
+        self.submodules = list(self.localrepo.submodules)
+        self.submodule_history = dict()
+        return None
@@ -0,0 +1,208 @@
+"""
+Module to schedule the GitHub and GitLab API requests of a build.
+Requests are paced according to the rate limit headers, and retried with
+exponential backoff when they are rate limited or fail transiently.
+"""
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import requests
+
+LOG = logging.getLogger("mkdocs.plugins." + __name__)
+
+# Server errors worth retrying, for idempotent requests only
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+
+class RequestScheduler:
+    """
+    Send API requests, while keeping track of the remaining rate limit budget.
+    Only authentication failures (401, or 403 without any sign of rate
+    limiting) are final: `auth_failed` is then set for the rest of the build.
+    """
+
+    def __init__(self, session: Optional[requests.Session] = None, max_retries: int = 5,
+                 max_wait: float = 600, backoff: float = 1.0):
+        # One pooled session for the whole build, to reuse connections
+        self.session = session or requests.Session()
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        self.backoff = backoff
+        self.lock = threading.Lock()
+        # Per resource (core or graphql): remaining requests and reset epoch time
+        self.budgets: Dict[str, tuple] = dict()
+        self.next_request: Dict[str, float] = dict()
+        self.limited_responses: Dict[str, requests.Response] = dict()
+        self.pending = 0
+        self.auth_failed = False
+        # Per-build stats
+        self.requests = 0
+        self.retries = 0
+        self.throttled_time = 0.0
+
+    def expect(self, count: int) -> None:
+        """
+        Announce how many requests the build is still going to make, so that
+        the rate limit budget can be spread across them.
+        """
+        with self.lock:
+            self.pending = count
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Send a request, waiting for its turn and retrying it when rate limited.
+        Args:
+            method (str): HTTP method
+            url (str): URL to request
+            kwargs: passed to the session
+        Returns:
+            (requests.Response): the last response received
+        """
+        resource = "graphql" if url.endswith("/graphql") else "core"
+        r = None
+        for attempt in range(self.max_retries + 1):
+            if not self.wait_turn(resource):
+                # Rate limit budget exhausted for longer than we are willing to wait
+                return self.limited_responses[resource]
+            try:
+                r = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+                LOG.warning(f"git-committers: {e.__class__.__name__} on {url}, retrying in {delay:.1f}s")
+                self.throttle(delay, retry=True)
+                continue
+            finally:
+                with self.lock:
+                    self.requests += 1
+            delay = self.retry_delay(r, resource, attempt, idempotent=method == "GET")
+            if delay is None or attempt == self.max_retries:
+                return r
+            if delay > self.max_wait:
+                LOG.error(f"git-committers: rate limit exceeded, and it resets in {delay:.0f}s, "
+                          f"which is more than {self.max_wait:.0f}s. Giving up on {url}")
+                return r
+            LOG.warning(f"git-committers: {r.status_code} {r.reason} on {url}, retrying in {delay:.1f}s")
+            self.throttle(delay, retry=True)
+        return r
+
+    def wait_turn(self, resource: str) -> bool:
+        """
+        Sleep until the next request on a resource can be sent.
+        Returns:
+            (bool): False if the budget is exhausted for longer than max_wait
+        """
+        with self.lock:
+            self.pending = max(0, self.pending - 1)
+            budget = self.budgets.get(resource)
+            if not budget:
+                return True
+            remaining, reset = budget
+            now = time.time()
+            if reset <= now:
+                del self.budgets[resource]
+                return True
+            if remaining <= 0:
+                delay = reset - now + 1
+                if delay > self.max_wait:
+                    if resource in self.limited_responses:
+                        return False
+                    # Let the request tell whether it is actually rate limited
+                    delay = 0
+            elif self.pending >= remaining and (reset - now) / remaining <= self.max_wait:
+                # Not enough budget left for the rest of the build: spread it until reset
+                interval = (reset - now) / remaining
+                start = max(now, self.next_request.get(resource, now))
+                self.next_request[resource] = start + interval
+                delay = start - now
+            else:
+                delay = 0
+        if delay > 0:
+            self.throttle(delay)
+        return True
+
+    def retry_delay(self, r: requests.Response, resource: str, attempt: int, idempotent: bool = True) -> Optional[float]:
+        """
+        Record the rate limit headers of a response, and decide whether to retry it.
+        Returns:
+            (float): seconds to wait before retrying, or None to not retry
+        """
+        headers = r.headers
+        # GitHub sends X-RateLimit-*, GitLab sends RateLimit-*
+        remaining = headers.get("X-RateLimit-Remaining", headers.get("RateLimit-Remaining"))
+        reset = headers.get("X-RateLimit-Reset", headers.get("RateLimit-Reset"))
+        with self.lock:
+            if remaining is not None and reset is not None:
+                try:
+                    self.budgets[resource] = (int(remaining), int(reset))
+                except ValueError:
+                    pass
+        if r.status_code == 401:
+            self.auth_failed = True
+            return None
+        if r.status_code in (403, 429):
+            retry_after = self.retry_after(headers.get("Retry-After"))
+            rate_limited = (r.status_code == 429 or retry_after is not None or remaining == "0"
+                            or "rate limit" in r.text.lower())
+            if not rate_limited:
+                self.auth_failed = True
+                return None
+            with self.lock:
+                self.limited_responses[resource] = r
+            if retry_after is not None:
+                return retry_after
+            if remaining == "0" and reset is not None:
+                return max(0.0, int(reset) - time.time()) + 1
+            return self.backoff_delay(attempt)
+        if idempotent and r.status_code in RETRY_STATUS_CODES:
+            return self.backoff_delay(attempt)
+        return None
+
+    @staticmethod
+    def retry_after(value: Optional[str]) -> Optional[float]:
+        # Retry-After is either a number of seconds or an HTTP date
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def backoff_delay(self, attempt: int) -> float:
+        # Exponential backoff with jitter, so that concurrent requests do not retry in lockstep
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
+
+    def throttle(self, delay: float, retry: bool = False) -> None:
+        with self.lock:
+            self.throttled_time += delay
+            if retry:
+                self.retries += 1
+        time.sleep(delay)
+
+    def budget(self) -> str:
+        with self.lock:
+            budgets = dict(self.budgets)
+        if not budgets:
+            return "rate limit budget unknown"
+        return ", ".join(f"{remaining} {resource} requests left until "
+                         f"{time.strftime('%H:%M:%S', time.localtime(reset))}"
+                         for resource, (remaining, reset) in sorted(budgets.items()))
+
+    def stats(self) -> str:
+        return (f"{self.requests} API requests, {self.retries} retries, "
+                f"{self.throttled_time:.1f}s throttled")
@@ -0,0 +1,73 @@
+"""
+Module to measure where the time of a build goes: per-phase timings (git,
+REST API, GraphQL API, GitLab user search, cache), cache hits and misses,
+and the slowest pages.
+"""
+import threading
+from contextlib import contextmanager
+from timeit import default_timer as timer
+from typing import Dict, Iterator, List
+
+
+class BuildTimings:
+    """
+    Timings of one build. Phases are measured from the threads prefetching
+    the pages concurrently, so their times add up to more than the build time.
+    """
+
+    def __init__(self, slowest_count: int = 5):
+        self.slowest_count = slowest_count
+        self.lock = threading.Lock()
+        # Per phase: total seconds and number of calls
+        self.phases: Dict[str, List[float]] = dict()
+        self.counters: Dict[str, int] = dict()
+        self.pages: Dict[str, float] = dict()
+
+    @contextmanager
+    def measure(self, phase: str) -> Iterator[None]:
+        start = timer()
+        try:
+            yield
+        finally:
+            self.add(phase, timer() - start)
+
+    def add(self, phase: str, seconds: float) -> None:
+        with self.lock:
+            total = self.phases.setdefault(phase, [0.0, 0])
+            total[0] += seconds
+            total[1] += 1
+
+    def count(self, counter: str, n: int = 1) -> None:
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def page(self, path: str, seconds: float) -> None:
+        with self.lock:
+            self.pages[path] = self.pages.get(path, 0.0) + seconds
+
+    def slowest_pages(self) -> List[tuple]:
+        return sorted(self.pages.items(), key=lambda page: page[1], reverse=True)[:self.slowest_count]
+
+    def summary(self) -> List[str]:
+        """
+        Returns:
+            (list): lines to log at the end of the build
+        """
+        lines = ["timings: " + ", ".join(f"{phase} {seconds:.2f}s ({calls} calls)" for phase, (seconds, calls) in sorted(self.phases.items()))]
+        hits, misses = self.counters.get("cache_hits", 0), self.counters.get("cache_misses", 0)
+        if hits + misses:
+            lines.append(f"{hits} cache hits, {misses} cache misses ({100 * hits / (hits + misses):.0f}% hit ratio)")
+        if self.pages:
+            lines.append("slowest pages: " + ", ".join(f"{path} {seconds:.2f}s" for path, seconds in self.slowest_pages()))
+        return lines
+
+    def report(self) -> dict:
+        """
+        Returns:
+            (dict): content of the JSON timings report
+        """
+        return {
+            "phases": {phase: {"seconds": round(seconds, 3), "calls": calls} for phase, (seconds, calls) in sorted(self.phases.items())},
+            "counters": dict(sorted(self.counters.items())),
+            "slowest_pages": [{"path": path, "seconds": round(seconds, 3)} for path, seconds in self.slowest_pages()],
+        }
@@ -22,7 +22,8 @@ setup(
     install_requires=[
         "mkdocs>=1.0.3",
         "requests",
-        "gitpython"
+        "gitpython",
+        "pyyaml"
     ],
     classifiers=[
         "Development Status :: 4 - Beta",
@@ -40,6 +41,9 @@ setup(
     entry_points={
         "mkdocs.plugins": [
             "git-committers = mkdocs_git_committers_plugin_2.plugin:GitCommittersPlugin"
+        ],
+        "console_scripts": [
+            "mkdocs-git-committers = mkdocs_git_committers_plugin_2.cli:main"
         ]
     }
 )